@@ -0,0 +1,83 @@
+# Copyright Rouven Bauer
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+from __future__ import annotations
+
+import ast
+import itertools
+import typing as t
+
+# Structural AST comparison that is equivalent to
+# `ast.dump(a) == ast.dump(b)` (i.e., fields are compared, attributes like
+# positions are not), but that stops at the first difference instead of
+# serializing both trees completely.
+
+_ast_compare: t.Callable[[ast.AST, ast.AST], bool] | None = getattr(
+    ast, "compare", None
+)
+
+_LIST = object()
+
+
+def _flatten(tree: ast.AST) -> t.Iterator[t.Any]:
+    # pre-order, left to right, like `ast.dump`
+    stack: list[t.Any] = [tree]
+    while stack:
+        value = stack.pop()
+        if isinstance(value, ast.AST):
+            yield type(value)
+            stack.extend(
+                getattr(value, field, None)
+                for field in reversed(value._fields)
+            )
+        elif isinstance(value, list):
+            yield _LIST, len(value)
+            stack.extend(reversed(value))
+        else:
+            yield type(value), value
+
+
+def ast_equal(a: ast.AST, b: ast.AST) -> bool:
+    if _ast_compare is not None:
+        return _ast_compare(a, b)
+    return all(
+        a_item == b_item
+        for a_item, b_item in itertools.zip_longest(
+            _flatten(a), _flatten(b), fillvalue=_LIST
+        )
+    )
+
+
+class AstFingerprint:
+    # The flattened baseline tree of a logical line. It is computed once and
+    # then compared against the trees of all variants of that line.
+
+    def __init__(self, tree: ast.AST) -> None:
+        self.tree = tree
+        self._items: list[t.Any] | None = None
+
+    def matches(self, other: ast.AST) -> bool:
+        if _ast_compare is not None:
+            return _ast_compare(self.tree, other)
+        if self._items is None:
+            self._items = list(_flatten(self.tree))
+        items = self._items
+        count = len(items)
+        idx = 0
+        for item in _flatten(other):
+            if idx >= count or items[idx] != item:
+                return False
+            idx += 1
+        return idx == count
@@ -15,43 +15,64 @@
 
 from __future__ import annotations
 
-import threading
 import tokenize
 import typing as t
 
+from ._file_context import FileContext
+from ._line_table import LineTable
 from ._meta import version
-from ._util import find_parens_coords
+from ._result_cache import ResultCache
 
 if t.TYPE_CHECKING:
     from argparse import Namespace
 
     from flake8.options.manager import OptionManager
-    from flake8.style_guide import DecisionEngine
 
-    from ._util import ParensCords
+    from ._util import ParensTable
 
 
 class PluginBracketsPosition:
     name = __name__
     version = version
 
-    _decision_engine: t.ClassVar[DecisionEngine | None] = None
-    _enabled_lock: t.ClassVar[threading.Lock] = threading.Lock()
-    _enabled: t.ClassVar[dict[str, bool]] = {}
+    _codes: t.ClassVar[tuple[str, ...]] = (
+        "PAR101", "PAR102", "PAR103", "PAR104"
+    )
+    # resolved once in `parse_options`, only read afterwards (no lock)
+    _enabled_codes: t.ClassVar[frozenset[str]] = frozenset(_codes)
+    _result_cache: t.ClassVar[ResultCache | None] = None
 
-    all_parens_coords: list[ParensCords]
+    all_parens_coords: ParensTable
 
     def __init__(self, tree, read_lines, file_tokens):
         self.source_code_lines = list(read_lines())
-        self.file_tokens = list(file_tokens)
+        # shared with `PluginRedundantParentheses`
+        self.context = FileContext.of(file_tokens)
+        self.file_tokens = self.context.tokens
+        self.token_table = self.context.token_table
         # all parentheses coordinates
-        self.all_parens_coords = find_parens_coords(self.file_tokens)
+        self.all_parens_coords = self.context.parens_coords
+        self.line_table = LineTable(
+            self.token_table, self.source_code_lines
+        )
         self.problems: list[tuple[int, int, str]] = []
 
     def run(self) -> t.Generator[tuple[int, int, str, t.Type], None, None]:
-        if not self.all_parens_coords:
+        if not self.all_parens_coords or not self._enabled_codes:
             return
-        self.check_brackets_position()
+        cache = self._result_cache
+        if cache is None:
+            self.check_brackets_position()
+        else:
+            cache_key = cache.key(
+                self.name, self._enabled_codes, self.source_code_lines
+            )
+            problems = cache.get(cache_key)
+            if problems is None:
+                self.check_brackets_position()
+                cache.put(cache_key, self.problems)
+            else:
+                self.problems = problems
         for line, col, msg in self.problems:
             yield line, col, msg, type(self)
 
@@ -62,170 +83,136 @@ class PluginBracketsPosition:
         options: Namespace,
         args: list[str],
     ) -> None:
-        from flake8.style_guide import DecisionEngine
-
-        cls._decision_engine = DecisionEngine(options)
-
-    @classmethod
-    def any_rule_enabled(cls, *codes: str) -> bool:
-        if cls._decision_engine is None:
-            return True
-        with cls._enabled_lock:
-            return any(cls._locked_rule_enabled(code) for code in codes)
-
-    @classmethod
-    def rule_enabled(cls, code: str) -> bool:
-        if cls._decision_engine is None:
-            return True
-        with cls._enabled_lock:
-            return cls._locked_rule_enabled(code)
-
-    @classmethod
-    def _locked_rule_enabled(cls, code: str) -> bool:
-        from flake8.style_guide import Decision
-
-        assert cls._decision_engine is not None
-
-        enabled = cls._enabled.get(code, None)
-        if enabled is None:
-            decision = cls._decision_engine.make_decision(code)
-            enabled = decision == Decision.Selected
-            cls._enabled[code] = enabled
-
-        return enabled
-
-    def first_in_line(self, cords: tuple[int, int]) -> bool:
-        return all(
-            self.source_code_lines[cords[0] - 1][col] in (" ", "\t")
-            for col in range(cords[1])
+        from flake8.style_guide import (
+            Decision,
+            DecisionEngine,
         )
 
-    def last_in_line(self, cords: ParensCords) -> bool:
-        end = [tokenize.COMMENT, tokenize.NL, tokenize.NEWLINE]
-        open_token_idx = cords.token_indexes[0]
-        next_token = self.file_tokens[open_token_idx + 1]
-        return next_token.type in end
-
-    def get_line_indentation(
-        self,
-        coords_open: tuple[int, int],
-    ) -> int:
-        line_tokens = (
-            token for token in self.file_tokens
-            if token.start[0] == coords_open[0]
+        engine = DecisionEngine(options)
+        cls._enabled_codes = frozenset(
+            code for code in cls._codes
+            if engine.make_decision(code) == Decision.Selected
         )
-        for token in line_tokens:
-            if token.type == tokenize.INDENT:
-                continue
-            return token.start[1]
-        raise AssertionError("This should never happen")
+        cls._result_cache = ResultCache.from_options(options)
 
     def check_brackets_position(self) -> None:
-        if self.any_rule_enabled("PAR101", "PAR102", "PAR103"):
-            self._check_par101_to_103()
-        if self.rule_enabled("PAR104"):
-            self._check_par104()
-
-    def _check_par101_to_103(self) -> None:
-        parens_coords_sorted = sorted(self.all_parens_coords,
-                                      key=lambda x: x.token_indexes[0])
-        for cords_idx, coords in enumerate(parens_coords_sorted):
-            coords_open, coords_close = coords[0], coords[3]
-            if coords_open[0] == coords_close[0]:
+        enabled_codes = self._enabled_codes
+        check_par101_to_103 = not enabled_codes.isdisjoint(
+            ("PAR101", "PAR102", "PAR103")
+        )
+        check_par103 = "PAR103" in enabled_codes
+        check_par104 = "PAR104" in enabled_codes
+        if not (check_par101_to_103 or check_par104):
+            return
+        # One forward pass over the pairs (in the order they are opened) and
+        # the tokens. Each pair takes O(1) (amortized) => O(tokens + pairs):
+        #  * the line table looks up the indentation of a row and whether a
+        #    bracket is first in its line
+        #  * a closing bracket first in its line is the only one in that line
+        #    => the look-ahead of PAR104 (until the end of the line) looks at
+        #    each token at most once
+        #  * PAR103 follows the parents of the last bracket of consecutive
+        #    opening brackets => each opening bracket is looked at once
+        parens_table = self.all_parens_coords
+        open_rows = parens_table.open_rows
+        open_cols = parens_table.open_cols
+        close_rows = parens_table.close_rows
+        close_cols = parens_table.close_cols
+        open_indexes = parens_table.open_indexes
+        close_indexes = parens_table.close_indexes
+        parents = parens_table.parents
+        types = self.token_table.types
+        line_table = self.line_table
+        indent_widths = line_table.indent_widths
+        line_ends = (tokenize.COMMENT, tokenize.NL, tokenize.NEWLINE)
+        par104_problems = []
+        for pair in parens_table.open_order:
+            open_idx = open_indexes[pair]
+            close_idx = close_indexes[pair]
+            close_row, close_col = close_rows[pair], close_cols[pair]
+            # `line_table.first_in_line`, inlined
+            close_first_in_line = close_col <= indent_widths[close_row]
+            if (
+                check_par104
+                and close_first_in_line
+                and self._par104_after(close_idx)
+            ):
+                par104_problems.append((
+                    close_row, close_col,
+                    "PAR104: Only operators and comments are allowed "
+                    "after a closing bracket on a new line"
+                ))
+            if not check_par101_to_103:
+                continue
+            open_row, open_col = open_rows[pair], open_cols[pair]
+            if open_row == close_row:
                 # opening and closing brackets in the same line
                 continue
-            if not self.last_in_line(coords):
+            if types[open_idx + 1] not in line_ends:
+                # opening bracket is not last in line
                 continue
-            if not self.first_in_line(coords_close):
+            if not close_first_in_line:
                 self.problems.append((
-                    coords_open[0], coords_open[1],
+                    open_row, open_col,
                     "PAR101: Opening bracket is last, but closing is not "
                     "on new line"
                 ))
                 continue
             # check if the closing bracket has the same indentation as the
             # line with the opening bracket
-            if coords_close[1] != self.get_line_indentation(coords_open):
-                count = 0
-                while (self.file_tokens[coords.token_indexes[0] - count]
-                       .start[0]
-                        == self.file_tokens[coords.token_indexes[0]].start[0]):
-                    count += 1
-                if (self.file_tokens[coords.token_indexes[0] - count].type
-                        == tokenize.STRING):
-                    break
+            if close_col != line_table.indentation(open_row):
+                first = line_table.first_token(open_row)
+                if types[first - 1] == tokenize.STRING:
+                    # the line continues a multi-line string; no further
+                    # pairs are checked for PAR101 to PAR103
+                    check_par101_to_103 = False
+                    continue
                 self.problems.append((
-                    coords_close[0], coords_close[1],
+                    close_row, close_col,
                     "PAR102: Closing bracket has different indentation than "
                     "the line with the opening bracket"
                 ))
 
             # if lines ends with `[({`, there should be a line that starts
             # with `]})` (matching closing brackets)
-            if not self.rule_enabled("PAR103"):
+            if not check_par103:
                 continue
-            for offset, prev_coords in enumerate(
-                reversed(parens_coords_sorted[:cords_idx])
+            parent = parents[pair]
+            offset = 1
+            while (
+                parent >= 0 and open_indexes[parent] == open_idx - offset
             ):
-                offset += 1
-                prev_coord_open_token_idx = prev_coords.token_indexes[0]
-                prev_coord_close_token_idx = prev_coords.token_indexes[1]
-                coord_open_token_idx = coords.token_indexes[0]
-                coord_close_token_idx = coords.token_indexes[1]
-                is_opening_sequence = \
-                    prev_coord_open_token_idx == coord_open_token_idx - offset
-                is_closing_sequence = \
-                    prev_coord_close_token_idx == coord_close_token_idx \
-                    + offset
-                if is_opening_sequence and not is_closing_sequence:
+                if close_indexes[parent] != close_idx + offset:
                     self.problems.append((
-                        coords[0][0], coords[0][1],
+                        open_row, open_col,
                         "PAR103: Consecutive opening brackets at the end of "
                         "the line must have consecutive closing brackets."
                     ))
-
-    def _check_par104(self) -> None:
-        # if there is a closing bracket on after a new line, this line should
-        # only contain: operators and comments
-        for coords in self.all_parens_coords:
-            if coords[0] in self.problems:
-                continue
-            breaker = None
-            _, token_idx_end = coords.token_indexes
-            close_coords = coords.close
-            if not self.first_in_line(close_coords):
-                continue
-            if self.file_tokens[token_idx_end - 1].type == tokenize.NL:
-                token = token_idx_end
-                try:
-                    if (
-                        token_idx_end < len(self.file_tokens) - 1
-                        and self.file_tokens[token_idx_end + 1].type
-                            in (tokenize.NAME, tokenize.OP)
-                    ):
-                        if self.file_tokens[token_idx_end + 1].string == ".":
-                            continue
-                        while (self.file_tokens[token].type != tokenize.NL
-                               or self.file_tokens[token].type
-                               != tokenize.NEWLINE):
-                            if (self.file_tokens[token - 1].string == ":"
-                                    and self.file_tokens[token].type
-                                    in (tokenize.NEWLINE, tokenize.NL)):
-                                # the next token is probably a keyword
-                                breaker = 1
-                                break
-                            token += 1
-                except IndexError:
-                    pass
-            for token in self.file_tokens[token_idx_end:]:
-                if token.type in (tokenize.NL, tokenize.NEWLINE):
-                    # reached the next line, all cool
-                    break
-                if (token.type not in (tokenize.OP, tokenize.COMMENT)
-                        and breaker != 1):
-                    self.problems.append((
-                        close_coords[0], close_coords[1],
-                        "PAR104: Only operators and comments are allowed "
-                        "after a closing bracket on a new line"
-                    ))
-                    break
+                parent = parents[parent]
+                offset += 1
+        self.problems.extend(par104_problems)
+
+    def _par104_after(self, close_idx: int) -> bool:
+        # whether anything but operators and comments follows the closing
+        # bracket (first in its line) in its line
+        types = self.token_table.types
+        line_break = self.token_table.next_line_breaks[close_idx]
+        if (
+            types[close_idx - 1] == tokenize.NL
+            and types[close_idx + 1] in (tokenize.NAME, tokenize.OP)
+        ):
+            if self.file_tokens[close_idx + 1].string == ".":
+                return False
+            last = line_break - 1
+            if types[last] == tokenize.COMMENT:
+                last -= 1
+            if (
+                line_break < len(types)
+                and self.file_tokens[last].string == ":"
+            ):
+                # the next token is probably a keyword
+                return False
+        return any(
+            types[token] not in (tokenize.OP, tokenize.COMMENT)
+            for token in range(close_idx + 1, line_break)
+        )
@@ -0,0 +1,71 @@
+# Copyright Rouven Bauer
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+from __future__ import annotations
+
+import threading
+import tokenize
+import typing as t
+
+from ._token_table import TokenTable
+from ._util import ParensTable
+
+# What both plugins need to know about a file: its tokens (also as a
+# `TokenTable`) and all pairs of brackets. flake8 creates both plugins for the
+# same file with the same list of tokens => the context of the last file is
+# kept and handed out again as long as the plugins get the same (identical)
+# list. The context keeps the list alive, so its identity can't be reused by
+# another file's list in the meantime.
+# flake8 runs the checks in multiple processes: each of them has its own
+# context, nothing is shared between processes.
+# The parts are built lazily, once. Don't modify what you get.
+
+
+class FileContext:
+    _lock: t.ClassVar[threading.Lock] = threading.Lock()
+    _last: t.ClassVar[FileContext | None] = None
+
+    def __init__(self, file_tokens: t.Iterable[tokenize.TokenInfo]) -> None:
+        self.source = file_tokens
+        if isinstance(file_tokens, list):
+            self.tokens = file_tokens
+        else:
+            self.tokens = list(file_tokens)
+        self._token_table: TokenTable | None = None
+        self._parens_coords: ParensTable | None = None
+
+    @classmethod
+    def of(cls, file_tokens: t.Iterable[tokenize.TokenInfo]) -> FileContext:
+        with cls._lock:
+            context = cls._last
+            if context is None or context.source is not file_tokens:
+                context = cls(file_tokens)
+                cls._last = context
+            return context
+
+    @property
+    def token_table(self) -> TokenTable:
+        if self._token_table is None:
+            self._token_table = TokenTable(self.tokens)
+        return self._token_table
+
+    @property
+    def parens_coords(self) -> ParensTable:
+        # all pairs of the file, in the order they are closed
+        if self._parens_coords is None:
+            self._parens_coords = ParensTable(
+                self.tokens, self.token_table
+            )
+        return self._parens_coords
@@ -0,0 +1,63 @@
+# Copyright Rouven Bauer
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+from __future__ import annotations
+
+import ast
+import bisect
+import typing as t
+
+# Maps logical lines to the nodes of the file's AST they are made of. For a
+# simple statement, that's the statement itself. For the header of a compound
+# statement (`if a:`, `except E:`, `case p:`, a decorator, ...), it's the
+# nodes of the header, without the body.
+
+
+class LineNode(t.NamedTuple):
+    node: ast.AST
+    parent: t.Optional[ast.AST]
+    field: str
+    position: int
+
+
+def index_logical_lines(
+    tree: ast.AST, line_ranges: t.Sequence[tuple[int, int]]
+) -> list[list[LineNode]]:
+    # `line_ranges` are the (first, last) rows of the logical lines, sorted
+    # and not overlapping
+    starts = [first_row for first_row, _ in line_ranges]
+    nodes_by_line: list[list[LineNode]] = [[] for _ in line_ranges]
+    stack = [LineNode(tree, None, "", 0)]
+    while stack:
+        line_node = stack.pop()
+        node = line_node.node
+        lineno = getattr(node, "lineno", None)
+        if lineno is not None:
+            end_lineno = node.end_lineno  # type: ignore[attr-defined]
+            idx = bisect.bisect_right(starts, end_lineno) - 1
+            if idx < 0 or line_ranges[idx][1] < lineno:
+                # not part of any of the logical lines
+                continue
+            if starts[idx] <= lineno and end_lineno <= line_ranges[idx][1]:
+                nodes_by_line[idx].append(line_node)
+                continue
+        for field, value in ast.iter_fields(node):
+            if isinstance(value, list):
+                for position, item in enumerate(value):
+                    if isinstance(item, ast.AST):
+                        stack.append(LineNode(item, node, field, position))
+            elif isinstance(value, ast.AST):
+                stack.append(LineNode(value, node, field, 0))
+    return nodes_by_line
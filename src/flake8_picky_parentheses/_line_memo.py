@@ -0,0 +1,243 @@
+# Copyright Rouven Bauer
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+from __future__ import annotations
+
+from collections import OrderedDict
+import hashlib
+import json
+import os
+import sys
+import threading
+import time
+import typing as t
+
+from ._meta import version
+
+try:
+    import sqlite3
+except ImportError:  # Python built without sqlite
+    sqlite3 = None  # type: ignore[assignment]
+
+# Remembers the problems found in a (stripped) logical line by its text. The
+# same lines (`return (None)`, logging calls, generated code, ...) tend to
+# repeat across a code base and their problems don't depend on the rest of
+# the file.
+# flake8 runs the checks in multiple processes: each of them has its own
+# memo. A `LineStore` persists the memo across runs and processes, so only
+# the new or changed lines of an edited file need to be checked.
+
+Positions = t.Tuple[t.Tuple[int, int], ...]
+
+DEFAULT_SIZE = 4096
+_DAY = 24 * 60 * 60
+
+
+class LineMemo:
+    def __init__(
+        self, maxsize: int = DEFAULT_SIZE, store: LineStore | None = None
+    ) -> None:
+        self.maxsize = maxsize
+        self.store = store
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[str, Positions] = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def get(self, line: str) -> Positions | None:
+        if self.maxsize <= 0 and self.store is None:
+            return None
+        with self._lock:
+            positions = self._entries.get(line)
+            if positions is not None:
+                self._entries.move_to_end(line)
+            elif self.store is not None:
+                positions = self.store.get(line)
+                if positions is not None:
+                    self._locked_put(line, positions)
+            if positions is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            return positions
+
+    def put(self, line: str, positions: Positions) -> None:
+        with self._lock:
+            self._locked_put(line, positions)
+            if self.store is not None:
+                self.store.put(line, positions)
+
+    def flush(self) -> None:
+        if self.store is not None:
+            with self._lock:
+                self.store.flush()
+
+    def resize(self, maxsize: int) -> None:
+        # 0 turns the memo off
+        with self._lock:
+            self.maxsize = maxsize
+            self._evict()
+
+    def _locked_put(self, line: str, positions: Positions) -> None:
+        if self.maxsize <= 0:
+            return
+        self._entries[line] = positions
+        self._entries.move_to_end(line)
+        self._evict()
+
+    def _evict(self) -> None:
+        while len(self._entries) > max(self.maxsize, 0):
+            self._entries.popitem(last=False)
+
+
+class LineStore:
+    # A sqlite database shared by all processes. Lines are stored by a hash
+    # of their text, the plugin version, and the Python version (the ASTs
+    # differ). Writes are collected and committed once per file. Every error
+    # is treated like a miss; a broken store must never break linting.
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._connection: sqlite3.Connection | None = None
+        self._pid: int | None = None
+        self._pending: dict[bytes, str] = {}
+        # keys of lines found that were last used on an earlier day
+        self._used: set[bytes] = set()
+
+    @staticmethod
+    def _key(line: str) -> bytes:
+        hash_ = hashlib.blake2b(digest_size=16)
+        hash_.update(f"{version}\0{sys.version}\0".encode("utf-8"))
+        hash_.update(line.encode("utf-8", "surrogatepass"))
+        return hash_.digest()
+
+    @staticmethod
+    def _today() -> int:
+        return int(time.time() // _DAY)
+
+    def _connect(self) -> sqlite3.Connection | None:
+        if sqlite3 is None:
+            return None
+        if self._pid != os.getpid():
+            # flake8 forks its workers, a connection must not be shared
+            self._pid = os.getpid()
+            self._connection = None
+            try:
+                connection = sqlite3.connect(self.path, timeout=5)
+            except sqlite3.Error:
+                return None
+            try:
+                connection.execute("PRAGMA journal_mode=WAL")
+                connection.execute(
+                    "CREATE TABLE IF NOT EXISTS lines ("
+                    "key BLOB PRIMARY KEY, "
+                    "positions TEXT NOT NULL, "
+                    "used INTEGER NOT NULL"
+                    ") WITHOUT ROWID"
+                )
+            except sqlite3.Error:
+                connection.close()
+                return None
+            self._connection = connection
+        return self._connection
+
+    def get(self, line: str) -> Positions | None:
+        connection = self._connect()
+        if connection is None:
+            return None
+        key = self._key(line)
+        try:
+            row = connection.execute(
+                "SELECT positions, used FROM lines WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            positions = tuple(
+                (int(line_), int(column))
+                for line_, column in json.loads(row[0])
+            )
+        except (sqlite3.Error, ValueError, TypeError):
+            return None
+        if row[1] < self._today():
+            self._used.add(key)
+        return positions
+
+    def put(self, line: str, positions: Positions) -> None:
+        self._pending[self._key(line)] = json.dumps(positions)
+
+    def flush(self) -> None:
+        pending, self._pending = self._pending, {}
+        used, self._used = self._used, set()
+        connection = self._connect()
+        if connection is None or not (pending or used):
+            return
+        today = self._today()
+        try:
+            with connection:
+                connection.executemany(
+                    "INSERT OR REPLACE INTO lines VALUES (?, ?, ?)",
+                    [(key, positions, today)
+                     for key, positions in pending.items()]
+                )
+                connection.executemany(
+                    "UPDATE lines SET used = ? WHERE key = ?",
+                    [(today, key) for key in used]
+                )
+        except sqlite3.Error:
+            pass
+
+    def close(self) -> None:
+        if self._connection is not None and self._pid == os.getpid():
+            self._connection.close()
+        self._connection = None
+        self._pid = None
+
+    def compact(self, max_age: float, max_size: int) -> None:
+        # Drop the lines that were not used for `max_age` seconds, then the
+        # least recently used ones until the database fits into `max_size`
+        # bytes.
+        connection = self._connect()
+        if connection is None:
+            return
+        try:
+            with connection:
+                connection.execute(
+                    "DELETE FROM lines WHERE used < ?",
+                    (self._today() - max_age // _DAY,)
+                )
+            page_size, = connection.execute("PRAGMA page_size").fetchone()
+            page_count, = connection.execute("PRAGMA page_count").fetchone()
+            if page_size * page_count <= max_size:
+                return
+            row_count, = connection.execute(
+                "SELECT COUNT(*) FROM lines"
+            ).fetchone()
+            # keep the most recently used lines that fit (estimated)
+            keep = row_count * max_size // (page_size * page_count)
+            with connection:
+                connection.execute(
+                    "DELETE FROM lines WHERE key NOT IN ("
+                    "SELECT key FROM lines ORDER BY used DESC LIMIT ?"
+                    ")",
+                    (keep,)
+                )
+            connection.execute("VACUUM")
+        except sqlite3.Error:
+            pass
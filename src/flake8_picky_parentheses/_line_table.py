@@ -0,0 +1,80 @@
+# Copyright Rouven Bauer
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+from __future__ import annotations
+
+from array import array
+import tokenize
+import typing as t
+
+if t.TYPE_CHECKING:
+    from ._token_table import TokenTable
+
+# What the checks ask about the rows (1-based, like the tokens' rows) of a
+# file, looked up instead of scanning the tokens or the characters of a line
+# for every question:
+#  * `indent_widths`: number of spaces and tabs the line starts with, built
+#    once for all lines; a token is first in its line if its column is not
+#    greater than that
+#  * `first_tokens`: index of the first token starting in the row or later.
+#    Filled up to the rows asked for so far: going through all tokens of a
+#    large file costs more than the checks need. Each token is only looked at
+#    once, however the rows are asked for.
+
+
+class LineTable:
+    indent_widths: array[int]
+
+    def __init__(
+        self, token_table: TokenTable, lines: t.Sequence[str]
+    ) -> None:
+        self.token_table = token_table
+        self.lines = lines
+        self.first_tokens = array("i")
+
+    def __getattr__(self, name: str) -> array[int]:
+        # like the columns of `TokenTable`, built on first use
+        if name == "indent_widths":
+            column = array("i", [0])
+            column.extend([
+                len(line) - len(line.lstrip(" \t")) for line in self.lines
+            ])
+        else:
+            raise AttributeError(name)
+        setattr(self, name, column)
+        return column
+
+    def first_in_line(self, row: int, col: int) -> bool:
+        # whether only whitespace is before `col` in the line
+        return col <= self.indent_widths[row]
+
+    def first_token(self, row: int) -> int:
+        # index of the first token starting in `row` or later
+        first_tokens = self.first_tokens
+        if row >= len(first_tokens):
+            start_rows = self.token_table.start_rows
+            idx = first_tokens[-1] if first_tokens else 0
+            for next_row in range(len(first_tokens), row + 1):
+                while idx < len(start_rows) and start_rows[idx] < next_row:
+                    idx += 1
+                first_tokens.append(idx)
+        return first_tokens[row]
+
+    def indentation(self, row: int) -> int:
+        # column of the first token (but `INDENT`) starting in `row`
+        idx = self.first_token(row)
+        if self.token_table.types[idx] == tokenize.INDENT:
+            idx += 1
+        return self.token_table.start_cols[idx]
@@ -0,0 +1,152 @@
+# Copyright Rouven Bauer
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+from __future__ import annotations
+
+import ast
+import bisect
+import typing as t
+
+# A flat table of all nodes of an AST, built without recursion (deeply nested
+# code must not hit the recursion limit). The columns are parallel lists and
+# the rows are sorted by (start, depth), so the outermost of the nodes
+# starting at the same position comes first.
+# Only the first `size` rows are nodes with a position (and only they have
+# a start and an end). Nodes without one (e.g., `ast.arguments` or
+# `ast.comprehension`) come after them; they are only in the table to be
+# looked up as parents.
+# As the rows are sorted by start, the table doubles as an index of the node
+# spans: the nodes starting in a span are found by bisecting.
+
+Position = t.Tuple[int, int]
+
+
+class NodeTable:
+    def __init__(self, tree: ast.AST) -> None:
+        # walk in pre-order, so parents get their row before their children
+        nodes: list[ast.AST] = []
+        starts: list[Position | None] = []
+        ends: list[Position | None] = []
+        parents: list[int] = []
+        depths: list[int] = []
+        missing_ends = False
+        stack = [(tree, -1, 0)]
+        while stack:
+            node, parent, depth = stack.pop()
+            row = len(nodes)
+            nodes.append(node)
+            parents.append(parent)
+            depths.append(depth)
+            lineno = col_offset = None
+            if node._attributes:
+                lineno = getattr(node, "lineno", None)
+                col_offset = getattr(node, "col_offset", None)
+            if lineno is None or col_offset is None:
+                starts.append(None)
+                ends.append(None)
+            else:
+                starts.append((lineno, col_offset))
+                end_lineno = getattr(node, "end_lineno", None)
+                end_col_offset = getattr(node, "end_col_offset", None)
+                if end_lineno is None or end_col_offset is None:
+                    # Python 3.7 => derived from the children below
+                    ends.append(None)
+                    missing_ends = True
+                else:
+                    ends.append((end_lineno, end_col_offset))
+            children: list[ast.AST] = []
+            for field in node._fields:
+                value = getattr(node, field, None)
+                if isinstance(value, list):
+                    children.extend(value)
+                elif isinstance(value, ast.AST):
+                    children.append(value)
+            depth += 1
+            for child in reversed(children):
+                # skip `ast.Load`, `ast.Add`, ...: neither positions nor
+                # children
+                if isinstance(child, ast.AST) and (
+                    child._fields or child._attributes
+                ):
+                    stack.append((child, row, depth))
+        if missing_ends:
+            self._derive_ends(starts, ends, parents)
+
+        positioned = [row for row, start in enumerate(starts)
+                      if start is not None]
+        positioned.sort(key=lambda row: (starts[row], depths[row]))
+        order = positioned + [row for row, start in enumerate(starts)
+                              if start is None]
+        new_rows = [0] * len(order)
+        for new_row, row in enumerate(order):
+            new_rows[row] = new_row
+        self.size = len(positioned)
+        self.nodes = [nodes[row] for row in order]
+        self.starts = t.cast("list[Position]",
+                             [starts[row] for row in positioned])
+        self.ends = t.cast("list[Position]", [ends[row] for row in positioned])
+        self.parents = [-1 if parents[row] < 0 else new_rows[parents[row]]
+                        for row in order]
+        self.depths = [depths[row] for row in order]
+        # number of rows looked at by the queries below
+        self.visits = 0
+
+    @staticmethod
+    def _derive_ends(
+        starts: list[Position | None],
+        ends: list[Position | None],
+        parents: list[int],
+    ) -> None:
+        # A node without an end ends with the last of its descendants (or
+        # its start). Children come after their parents in pre-order =>
+        # going backwards, all descendants are done before their ancestor.
+        subtree_ends: list[Position] = [(0, 0)] * len(starts)
+        for row in range(len(starts) - 1, -1, -1):
+            start = starts[row]
+            if start is not None:
+                end = ends[row]
+                if end is None:
+                    end = max(start, subtree_ends[row])
+                    ends[row] = end
+            else:
+                end = subtree_ends[row]
+            parent = parents[row]
+            if parent >= 0 and end > subtree_ends[parent]:
+                subtree_ends[parent] = end
+
+    def parent(self, row: int) -> ast.AST | None:
+        parent = self.parents[row]
+        return None if parent < 0 else self.nodes[parent]
+
+    def starting_at(self, pos: Position) -> range:
+        # the rows of the nodes starting at `pos`, outermost first
+        first = bisect.bisect_left(self.starts, pos)
+        last = bisect.bisect_right(self.starts, pos, first)
+        self.visits += last - first
+        return range(first, last)
+
+    def enclosed(self, start: Position, end: Position) -> t.Iterator[int]:
+        # the rows of the nodes within [start, end], in table order => the
+        # first one is the outermost node starting first
+        row = bisect.bisect_left(self.starts, start)
+        starts = self.starts
+        ends = self.ends
+        while row < self.size:
+            if starts[row] > end:
+                return
+            self.visits += 1
+            if ends[row] <= end:
+                yield row
+            row += 1
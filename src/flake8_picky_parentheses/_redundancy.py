@@ -0,0 +1,785 @@
+# Copyright Rouven Bauer
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+from __future__ import annotations
+
+import ast
+import keyword
+import sys
+import tokenize
+import typing as t
+
+from ._util import (
+    CALLABLE_KEYWORDS,
+    is_call_like,
+    SOFT_KEYWORDS,
+    split_lines,
+)
+
+if t.TYPE_CHECKING:
+    from ._line_index import LineNode
+    from ._util import ParensCords
+
+
+# Decides whether a parenthesis pair is redundant by looking at the AST of the
+# logical line it belongs to, instead of removing the pair and re-parsing the
+# line.
+# Each verdict must be exactly what the remove-and-reparse check would have
+# answered. Whenever that cannot be guaranteed, `None` is returned and the
+# caller has to fall back to the remove-and-reparse check.
+
+
+Span = t.Tuple[int, int, int, int]
+
+_NAMED_EXPR = 0
+_LAMBDA = 1
+_IF_EXP = 2
+_OR = 3
+_AND = 4
+_NOT = 5
+_COMPARE = 6
+_UNARY = 13
+_POW = 14
+_AWAIT = 15
+_ATOM = 16
+# never valid as an operand
+_YIELD = -1
+
+_BINOP_PRECEDENCE = {
+    ast.BitOr: 7,
+    ast.BitXor: 8,
+    ast.BitAnd: 9,
+    ast.LShift: 10,
+    ast.RShift: 10,
+    ast.Add: 11,
+    ast.Sub: 11,
+    ast.Mult: 12,
+    ast.MatMult: 12,
+    ast.Div: 12,
+    ast.FloorDiv: 12,
+    ast.Mod: 12,
+    ast.Pow: _POW,
+}
+
+_ATOM_TYPES = (
+    ast.Name, ast.Constant, ast.Attribute, ast.Subscript, ast.Call,
+    ast.List, ast.Tuple, ast.Dict, ast.Set, ast.ListComp, ast.SetComp,
+    ast.DictComp, ast.GeneratorExp, ast.JoinedStr,
+)
+
+_NamedExpr = getattr(ast, "NamedExpr", None)
+
+_IGNORED_TOKEN_TYPES = {tokenize.NL, tokenize.COMMENT}
+
+_FSTRING_START = getattr(tokenize, "FSTRING_START", None)
+
+# expressions that are not valid (or mean something else) on their own
+_UNPARSABLE_ALONE = (ast.Starred, ast.Slice, ast.JoinedStr)
+
+
+def _precedence(node: ast.AST) -> int | None:
+    if isinstance(node, _ATOM_TYPES):
+        return _ATOM
+    if isinstance(node, ast.BinOp):
+        return _BINOP_PRECEDENCE[type(node.op)]
+    if isinstance(node, ast.UnaryOp):
+        return _NOT if isinstance(node.op, ast.Not) else _UNARY
+    if isinstance(node, ast.Compare):
+        return _COMPARE
+    if isinstance(node, ast.BoolOp):
+        return _OR if isinstance(node.op, ast.Or) else _AND
+    if isinstance(node, ast.Await):
+        return _AWAIT
+    if isinstance(node, ast.IfExp):
+        return _IF_EXP
+    if isinstance(node, ast.Lambda):
+        return _LAMBDA
+    if _NamedExpr is not None and isinstance(node, _NamedExpr):
+        return _NAMED_EXPR
+    if isinstance(node, (ast.Yield, ast.YieldFrom)):
+        return _YIELD
+    return None
+
+
+class _NodeInfo(t.NamedTuple):
+    node: ast.AST
+    parent: ast.AST
+    field: str
+    position: int
+
+
+# the nodes by the position they start at
+_NodesByStart = t.Dict[t.Tuple[int, int], t.List[t.Tuple[Span, _NodeInfo]]]
+
+
+class RedundancyEngine:
+    supported = sys.version_info >= (3, 8)
+
+    def __init__(
+        self,
+        tree: ast.AST | None,
+        tokens: t.Sequence[tokenize.TokenInfo],
+        line: str,
+    ) -> None:
+        # `tree` can be `None` (and the nodes attached later) when only the
+        # token based checks are needed
+        self._roots: list[tuple[ast.AST, ast.AST | None, str, int]] = (
+            [] if tree is None else [(tree, None, "", 0)]
+        )
+        self.tokens = tokens
+        # the line numbers of the nodes are off by this many lines
+        self.line_offset = 0
+        # and the column offsets on the first line by this many columns
+        self.column_offset = 0
+        self.lines = split_lines(line, keepends=True)
+        self._nodes_by_span: dict[Span, _NodeInfo] | None = None
+        self._pattern_spans: list[tuple[tuple[int, int], tuple[int, int]]] = []
+        self._depths: list[int] = []
+        self._open_parens: dict[tuple[int, int], int] | None = None
+        self._nodes_by_start: _NodesByStart | None = None
+        # patterns can only occur in `case` clauses
+        self._may_have_patterns = sys.version_info >= (3, 10) and any(
+            token.type == tokenize.NAME and token.string == "case"
+            for token in tokens
+        )
+        # the expression text of `f"{(a)=}"` is part of the AST
+        self._has_f_strings = any(
+            token.type == _FSTRING_START for token in tokens
+        )
+        self._index_depths()
+
+    def attach_nodes(
+        self,
+        nodes: t.Iterable[LineNode],
+        line_offset: int = 0,
+        column_offset: int = 0,
+    ) -> None:
+        # the nodes of a larger tree (e.g., the file's) the line is made of
+        self._roots = list(nodes)
+        self.line_offset = line_offset
+        self.column_offset = column_offset
+
+    def parens_redundant_by_tokens(
+        self, parens_coord: ParensCords
+    ) -> bool | None:
+        # Zero-parse fast path: only decides pairs whose verdict follows from
+        # the tokens alone.
+        if self._may_have_patterns or self._has_f_strings:
+            return None
+        tokens = self.tokens
+        open_idx, close_idx = parens_coord.token_indexes
+        if tokens[open_idx].string != "(":
+            return False
+        if self._split_on_statement_level(open_idx, close_idx):
+            # removing the pair turns the line break into the end of the
+            # statement
+            return False
+        if (
+            parens_coord.replacement == ""
+            and tokens[open_idx + 1].start[0] != tokens[open_idx].end[0]
+        ):
+            return None
+        if (
+            parens_coord.replacement == " "
+            and tokens[open_idx - 1].type in (tokenize.INDENT, tokenize.DEDENT)
+        ):
+            return None
+        if self._multi_line_on_statement_level(open_idx, close_idx):
+            return None
+
+        prev_token = self._significant_token(open_idx, -1)
+        first_inner = self._significant_token(open_idx, 1)
+        last_inner = self._significant_token(close_idx, -1)
+        assert first_inner is not None and last_inner is not None
+        empty = first_inner == close_idx
+        wraps_single_pair = (
+            not empty
+            and tokens[first_inner].string == "("
+            and self._matching_close(first_inner) == last_inner
+        )
+        call_like = prev_token is not None and self._is_call_like(prev_token)
+        if call_like is None:
+            return None
+        if call_like:
+            assert prev_token is not None
+            if empty:
+                return self._empty_call_like_parens_redundant(prev_token)
+            if wraps_single_pair:
+                return None
+            return False
+        if self._directly_wrapped(open_idx, close_idx):
+            assert prev_token is not None
+            wrapping_prev_token = self._significant_token(prev_token, -1)
+            if (
+                wrapping_prev_token is None
+                or self._is_call_like(wrapping_prev_token) is False
+            ):
+                return True
+        if empty:
+            return False
+        if wraps_single_pair:
+            return True
+        if self._is_primary(first_inner, last_inner):
+            next_token = self._significant_token(close_idx, 1)
+            if (
+                prev_token is None
+                and next_token is not None
+                and tokens[next_token].string == ":"
+            ):
+                # `(a): int` is not a simple annotation target
+                return None
+            return True
+        if (
+            sys.version_info < (3, 14)
+            and prev_token is not None
+            and tokens[prev_token].string == "except"
+            and self._has_top_level_comma(open_idx, close_idx)
+        ):
+            # `except A, B:` is only valid syntax since Python 3.14
+            return False
+        return None
+
+    def parens_redundant(self, parens_coord: ParensCords) -> bool | None:
+        if not self.supported:
+            return None
+        tokens = self.tokens
+        open_idx, close_idx = parens_coord.token_indexes
+        if self._in_pattern(tokens[open_idx].start):
+            return None
+        if tokens[open_idx].string != "(":
+            # removing brackets or braces always removes a list, a set, a
+            # dict, a comprehension, or a subscript from the AST
+            return False
+        if (
+            parens_coord.replacement == ""
+            and tokens[open_idx + 1].start[0] != tokens[open_idx].end[0]
+        ):
+            # the opening parenthesis is alone on its line, whether the
+            # reparse check removes it depends on the rest of the line
+            return None
+        if (
+            parens_coord.replacement == " "
+            and tokens[open_idx - 1].type in (tokenize.INDENT, tokenize.DEDENT)
+        ):
+            # replacing the parenthesis with a space changes the indentation
+            return None
+        if self._multi_line_on_statement_level(open_idx, close_idx):
+            return None
+        nodes_by_span = self._get_nodes_by_span()
+
+        prev_token = self._significant_token(open_idx, -1)
+        first_inner = self._significant_token(open_idx, 1)
+        last_inner = self._significant_token(close_idx, -1)
+        assert first_inner is not None and last_inner is not None
+        empty = first_inner == close_idx
+        wraps_single_pair = (
+            not empty
+            and tokens[first_inner].string == "("
+            and self._matching_close(first_inner) == last_inner
+        )
+
+        call_like = prev_token is not None and self._is_call_like(prev_token)
+        if call_like is None:
+            return None
+        if call_like:
+            assert prev_token is not None
+            if empty:
+                return self._empty_call_like_parens_redundant(prev_token)
+            if wraps_single_pair:
+                # `f((a))` turns into `f (a)`
+                return None
+            return False
+        if self._directly_wrapped(open_idx, close_idx):
+            # the enclosing pair keeps grouping the expression
+            assert prev_token is not None
+            wrapping_prev_token = self._significant_token(prev_token, -1)
+            if wrapping_prev_token is None:
+                return True
+            wrapping_call_like = self._is_call_like(wrapping_prev_token)
+            if wrapping_call_like is None:
+                # `match ((a)).b:` or `match((a)).b`
+                return None
+            if not wrapping_call_like:
+                return True
+        if empty:
+            return False
+        if wraps_single_pair:
+            return True
+
+        own_span = self._span(open_idx, close_idx)
+        owner = nodes_by_span.get(own_span)
+        if owner is not None:
+            return self._owned_parens_redundant(owner, open_idx, close_idx)
+        inner_span = self._span(first_inner, last_inner)
+        info = nodes_by_span.get(inner_span)
+        if info is None:
+            return None
+        return self._grouping_parens_redundant(info)
+
+    def enclosing_expression(
+        self, parens_coord: ParensCords
+    ) -> tuple[ast.expr, Span] | None:
+        # The smallest expression strictly enclosing the pair that can be
+        # parsed on its own (in parentheses), or `None` if removing the pair
+        # could affect more than that expression.
+        if not self.supported:
+            return None
+        tokens = self.tokens
+        open_idx, close_idx = parens_coord.token_indexes
+        if self._depths[open_idx] == 0 and (
+            tokens[open_idx].start[0] != tokens[close_idx].start[0]
+            or tokens[open_idx - 1].type in (tokenize.INDENT, tokenize.DEDENT)
+        ):
+            # the pair's line breaks and indentation matter on statement
+            # level
+            return None
+        end = tokens[close_idx].end
+        nodes_by_start = self._get_nodes_by_start()
+        # the closest start position of an enclosing node belongs to the
+        # smallest enclosing node
+        for idx in range(open_idx, -1, -1):
+            for span, info in nodes_by_start.get(tokens[idx].start, ()):
+                if span[2:] < end or (idx == open_idx and span[2:] == end):
+                    continue
+                if self._can_parse_alone(info.node, span):
+                    return info.node, span  # type: ignore[return-value]
+        return None
+
+    def _can_parse_alone(self, node: ast.AST, span: Span) -> bool:
+        if isinstance(node, _UNPARSABLE_ALONE) or not isinstance(
+            getattr(node, "ctx", None), (ast.Load, type(None))
+        ):
+            return False
+        if isinstance(node, ast.Tuple) and (
+            not self._parenthesized(span)
+            or any(isinstance(elt, ast.Slice) for elt in node.elts)
+        ):
+            # the added parentheses would change how the elements are
+            # parsed
+            return False
+        return True
+
+    def _empty_call_like_parens_redundant(self, prev_idx: int) -> bool | None:
+        prev_token = self.tokens[prev_idx]
+        if prev_token.string == "]":
+            # type parameters
+            return None
+        if prev_token.type != tokenize.NAME:
+            return False
+        keyword_idx = self._significant_token(prev_idx, -1)
+        # `class A():` is the same as `class A:`
+        return (
+            keyword_idx is not None
+            and self.tokens[keyword_idx].string == "class"
+        )
+
+    def _owned_parens_redundant(
+        self, info: _NodeInfo, open_idx: int, close_idx: int
+    ) -> bool | None:
+        node, parent, field, _ = info
+        if isinstance(node, ast.GeneratorExp):
+            if not isinstance(parent, ast.Call):
+                return False if isinstance(parent, ast.expr) else None
+            prev_token = self._significant_token(open_idx, -1)
+            next_token = self._significant_token(close_idx, 1)
+            return (
+                field == "args"
+                and len(parent.args) == 1
+                and not parent.keywords
+                and prev_token is not None
+                and self.tokens[prev_token].string == "("
+                and next_token is not None
+                and self.tokens[next_token].string == ")"
+            )
+        if not isinstance(node, ast.Tuple):
+            return None
+        if not node.elts:
+            return False
+        if any(
+            isinstance(elt, ast.Starred) or _precedence(elt) == _NAMED_EXPR
+            for elt in node.elts
+        ):
+            return None
+        if isinstance(parent, (ast.Assign, ast.Expr, ast.Return, ast.Yield)):
+            return True
+        if isinstance(parent, ast.AugAssign) and field == "value":
+            return True
+        if isinstance(parent, (ast.For, ast.AsyncFor)):
+            return True
+        if isinstance(parent, ast.expr) and not isinstance(
+            parent,
+            (ast.Subscript, ast.Slice, ast.FormattedValue, ast.JoinedStr),
+        ):
+            return False
+        return None
+
+    @staticmethod
+    def _grouping_parens_redundant(info: _NodeInfo) -> bool | None:
+        node, parent, field, position = info
+        prec = _precedence(node)
+        if prec is None:
+            return None
+        is_named_expr = prec == _NAMED_EXPR
+        is_lambda = prec == _LAMBDA
+        is_yield = prec == _YIELD
+
+        if isinstance(parent, ast.BinOp):
+            parent_prec = _BINOP_PRECEDENCE[type(parent.op)]
+            if field == "left":
+                if prec == parent_prec:
+                    return parent_prec != _POW
+                return prec > parent_prec
+            if parent_prec == _POW:
+                return prec >= _UNARY
+            return prec > parent_prec
+        if isinstance(parent, ast.BoolOp):
+            return prec > _precedence(parent)  # type: ignore[operator]
+        if isinstance(parent, ast.UnaryOp):
+            return prec >= _precedence(parent)  # type: ignore[operator]
+        if isinstance(parent, ast.Compare):
+            return prec > _COMPARE
+        if isinstance(parent, ast.IfExp):
+            if field == "orelse":
+                return prec >= _LAMBDA
+            return prec >= _OR
+        if isinstance(parent, (ast.Lambda, ast.Yield, ast.YieldFrom)):
+            return prec >= _LAMBDA
+        if _NamedExpr is not None and isinstance(parent, _NamedExpr):
+            return prec >= _LAMBDA
+        if isinstance(parent, ast.Await):
+            return prec == _ATOM
+        if isinstance(parent, (ast.Attribute, ast.Subscript)):
+            if field == "value":
+                return prec == _ATOM
+            # Python 3.9+ subscript slice
+            if is_lambda or is_named_expr:
+                return None
+            return prec >= _LAMBDA
+        if sys.version_info < (3, 9) and isinstance(parent, ast.Index):
+            if is_lambda or is_named_expr:
+                return None
+            return prec >= _LAMBDA
+        if isinstance(parent, ast.Slice):
+            if is_lambda or is_named_expr:
+                return None
+            return prec >= _IF_EXP
+        if isinstance(parent, ast.Call):
+            if field == "func":
+                return prec == _ATOM
+            return not is_yield
+        if isinstance(parent, ast.keyword):
+            return prec >= _LAMBDA
+        if isinstance(parent, ast.Starred):
+            return True if prec >= 7 else None
+        if isinstance(parent, (ast.List, ast.Set, ast.Tuple)):
+            if is_named_expr:
+                return None
+            return not is_yield
+        if isinstance(parent, ast.Dict):
+            if field == "values":
+                if parent.keys[position] is None:
+                    # `**` unpacking
+                    return True if prec >= 7 else None
+                return prec >= _LAMBDA
+            if is_lambda or is_named_expr:
+                return None
+            return prec >= _IF_EXP
+        if isinstance(parent, ast.comprehension):
+            if field == "target":
+                return True
+            if is_lambda:
+                # allowed in conditions before Python 3.9
+                return None
+            return prec >= _OR
+        if isinstance(
+            parent, (ast.ListComp, ast.SetComp, ast.GeneratorExp, ast.DictComp)
+        ):
+            if is_lambda or is_named_expr:
+                return None
+            return prec >= _IF_EXP
+
+        if isinstance(parent, ast.Expr):
+            return not is_named_expr
+        if isinstance(parent, (ast.Assign, ast.AugAssign)):
+            if field == "value":
+                return not is_named_expr
+            return True
+        if isinstance(parent, ast.AnnAssign):
+            if field == "target":
+                # changes the `simple` flag
+                return None
+            if field == "annotation":
+                return prec >= _LAMBDA
+            return not is_named_expr
+        if isinstance(parent, ast.Return):
+            return not (is_named_expr or is_yield)
+        if isinstance(parent, ast.Delete):
+            return True
+        if isinstance(parent, (ast.Raise, ast.Assert)):
+            return prec >= _LAMBDA
+        if isinstance(parent, (ast.If, ast.While)):
+            if is_lambda:
+                return None
+            return not is_yield
+        if isinstance(parent, (ast.For, ast.AsyncFor)):
+            if field == "target":
+                return True
+            if is_lambda:
+                return None
+            return not (is_named_expr or is_yield)
+        return None
+
+    def _get_nodes_by_span(self) -> dict[Span, _NodeInfo]:
+        if self._nodes_by_span is None:
+            self._nodes_by_span = {}
+            self._index_nodes()
+        return self._nodes_by_span
+
+    def _get_nodes_by_start(self) -> _NodesByStart:
+        if self._nodes_by_start is None:
+            self._nodes_by_start = {}
+            for span, info in self._get_nodes_by_span().items():
+                self._nodes_by_start.setdefault(span[:2], []).append(
+                    (span, info)
+                )
+            for nodes in self._nodes_by_start.values():
+                nodes.sort(key=lambda item: item[0][2:])
+        return self._nodes_by_start
+
+    def _index_nodes(self) -> None:
+        assert self._nodes_by_span is not None
+        stack = self._roots[::-1]
+        while stack:
+            node, parent, field, index = stack.pop()
+            if isinstance(node, ast.expr) and parent is not None:
+                span = self._node_span(node)
+                if span not in self._nodes_by_span:
+                    self._nodes_by_span[span] = _NodeInfo(
+                        node, parent, field, index
+                    )
+            elif sys.version_info >= (3, 10) and isinstance(node, ast.pattern):
+                # patterns have their own grammar
+                span = self._node_span(node)
+                self._pattern_spans.append((span[:2], span[2:]))
+                continue
+            if isinstance(node, ast.JoinedStr):
+                # positions inside f-strings are unreliable, especially
+                # before Python 3.12
+                continue
+            for child_field, value in ast.iter_fields(node):
+                if isinstance(value, list):
+                    for child_index, item in enumerate(value):
+                        if isinstance(item, ast.AST):
+                            stack.append(
+                                (item, node, child_field, child_index)
+                            )
+                elif isinstance(value, ast.AST):
+                    stack.append((value, node, child_field, 0))
+
+    def _index_depths(self) -> None:
+        depth = 0
+        depths = self._depths
+        for token in self.tokens:
+            if token.type == tokenize.OP and token.string in "([{":
+                depths.append(depth)
+                depth += 1
+            elif token.type == tokenize.OP and token.string in ")]}":
+                depth -= 1
+                depths.append(depth)
+            else:
+                depths.append(depth)
+
+    def _multi_line_on_statement_level(
+        self, open_idx: int, close_idx: int
+    ) -> bool:
+        tokens = self.tokens
+        if tokens[open_idx].start[0] == tokens[close_idx].start[0]:
+            return False
+        depth = self._depths[open_idx]
+        if depth:
+            return False
+        return any(
+            tokens[i].type == tokenize.NL and self._depths[i] == depth + 1
+            for i in range(open_idx + 1, close_idx)
+        )
+
+    def _split_on_statement_level(
+        self, open_idx: int, close_idx: int
+    ) -> bool:
+        # whether the pair is on statement level and contains a line break
+        # (that is not inside other brackets) followed by more code
+        if self._depths[open_idx]:
+            return False
+        tokens = self.tokens
+        depth = self._depths[open_idx] + 1
+        prev_token = self._significant_token(open_idx, -1)
+        # without code before it, the line break only leaves an empty line
+        code_before = (
+            prev_token is not None
+            and tokens[prev_token].type
+            not in (tokenize.NEWLINE, tokenize.INDENT, tokenize.DEDENT)
+        )
+        line_break = False
+        for i in range(open_idx + 1, close_idx):
+            if tokens[i].type == tokenize.NL:
+                line_break = line_break or (
+                    code_before and self._depths[i] == depth
+                )
+            elif tokens[i].type != tokenize.COMMENT:
+                if line_break:
+                    return True
+                code_before = True
+        return False
+
+    def _is_primary(self, start_idx: int, end_idx: int) -> bool:
+        # an atom followed by any number of attribute accesses, calls, and
+        # subscripts: binds tighter than anything the pair could be part of
+        tokens = self.tokens
+        token = tokens[start_idx]
+        if token.type == tokenize.NAME:
+            if token.string in SOFT_KEYWORDS or (
+                keyword.iskeyword(token.string)
+                and token.string not in CALLABLE_KEYWORDS
+            ):
+                return False
+            idx = start_idx + 1
+        elif token.type == tokenize.NUMBER or token.string == "...":
+            idx = start_idx + 1
+        elif token.type == tokenize.STRING:
+            idx = start_idx + 1
+            while idx <= end_idx and tokens[idx].type in (
+                tokenize.STRING, tokenize.NL, tokenize.COMMENT
+            ):
+                idx += 1
+        else:
+            return False
+        while idx <= end_idx:
+            token = tokens[idx]
+            if token.type in _IGNORED_TOKEN_TYPES:
+                idx += 1
+            elif token.string == ".":
+                name_idx = self._significant_token(idx, 1)
+                if name_idx is None or tokens[name_idx].type != tokenize.NAME:
+                    return False
+                idx = name_idx + 1
+            elif token.string in ("(", "["):
+                idx = self._matching_close(idx) + 1
+                if idx == 0:
+                    return False
+            else:
+                return False
+        return idx == end_idx + 1
+
+    def _has_top_level_comma(self, open_idx: int, close_idx: int) -> bool:
+        depth = self._depths[open_idx] + 1
+        return any(
+            self.tokens[i].string == ","
+            and self.tokens[i].type == tokenize.OP
+            and self._depths[i] == depth
+            for i in range(open_idx + 1, close_idx)
+        )
+
+    def _directly_wrapped(self, open_idx: int, close_idx: int) -> bool:
+        prev_token = self._significant_token(open_idx, -1)
+        if prev_token is None or self.tokens[prev_token].string != "(":
+            return False
+        return (
+            self._matching_close(prev_token)
+            == self._significant_token(close_idx, 1)
+        )
+
+    def _parenthesized(self, span: Span) -> bool:
+        open_idx = self._open_parens_by_pos().get(span[:2])
+        return (
+            open_idx is not None
+            and self.tokens[self._matching_close(open_idx)].end == span[2:]
+        )
+
+    def _open_parens_by_pos(self) -> dict[tuple[int, int], int]:
+        if self._open_parens is None:
+            self._open_parens = {
+                token.start: idx
+                for idx, token in enumerate(self.tokens)
+                if token.type == tokenize.OP and token.string == "("
+            }
+        return self._open_parens
+
+    def _in_pattern(self, pos: tuple[int, int]) -> bool:
+        if not self._may_have_patterns:
+            return False
+        self._get_nodes_by_span()
+        return any(
+            start <= pos < end for start, end in self._pattern_spans
+        )
+
+    def _matching_close(self, open_idx: int) -> int:
+        depth = self._depths[open_idx]
+        for i in range(open_idx + 1, len(self.tokens)):
+            if (
+                self._depths[i] == depth
+                and self.tokens[i].type == tokenize.OP
+            ):
+                return i
+        return -1
+
+    def _significant_token(self, idx: int, step: int) -> int | None:
+        idx += step
+        while 0 <= idx < len(self.tokens):
+            if self.tokens[idx].type not in _IGNORED_TOKEN_TYPES:
+                return idx
+            idx += step
+        return None
+
+    def _is_call_like(self, idx: int) -> bool | None:
+        # same as for the kinds of the pairs (`classify_parens`)
+        prev_idx = self._significant_token(idx, -1)
+        return is_call_like(
+            self.tokens[idx],
+            None if prev_idx is None else self.tokens[prev_idx],
+        )
+
+    def _span(self, start_idx: int, end_idx: int) -> Span:
+        start = self.tokens[start_idx].start
+        end = self.tokens[end_idx].end
+        return (*start, *end)
+
+    def _node_span(self, node: ast.AST) -> Span:
+        lineno = node.lineno - self.line_offset  # type: ignore[attr-defined]
+        end_lineno = (
+            node.end_lineno  # type: ignore[attr-defined]
+            - self.line_offset
+        )
+        return (
+            lineno,
+            self._char_col(
+                lineno, node.col_offset  # type: ignore[attr-defined]
+            ),
+            end_lineno,
+            self._char_col(
+                end_lineno, node.end_col_offset  # type: ignore[attr-defined]
+            ),
+        )
+
+    def _char_col(self, lineno: int, byte_col: int) -> int:
+        # AST column offsets are UTF-8 byte offsets, tokens use characters
+        if lineno == 1:
+            # only indentation (ASCII) is cut off the first line
+            byte_col -= self.column_offset
+        if not 0 < lineno <= len(self.lines):
+            return byte_col
+        line = self.lines[lineno - 1]
+        if line.isascii():
+            return byte_col
+        return len(line.encode("utf-8")[:byte_col].decode("utf-8", "replace"))
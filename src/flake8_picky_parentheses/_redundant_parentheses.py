@@ -16,13 +16,42 @@
 from __future__ import annotations
 
 import ast
+import bisect
+import collections
 from dataclasses import dataclass
+import logging
 import sys
 import tokenize
 import typing as t
 
+from ._ast_compare import (
+    ast_equal,
+    AstFingerprint,
+)
+from ._batch_parse import parse_batch
+from ._file_context import FileContext
+from ._line_index import index_logical_lines
+from ._line_memo import (
+    DEFAULT_SIZE as DEFAULT_LINE_MEMO_SIZE,
+    LineMemo,
+)
 from ._meta import version
-from ._util import find_parens_coords
+from ._node_table import NodeTable
+from ._redundancy import RedundancyEngine
+from ._result_cache import (
+    add_cache_options,
+    ResultCache,
+)
+from ._util import (
+    classify_parens,
+    DEFINITION,
+    DISPLAY,
+    find_parens_coords,
+    GENERATOR,
+    GROUPING,
+    split_lines,
+    SUBSCRIPT,
+)
 
 if t.TYPE_CHECKING:
     from argparse import Namespace
@@ -32,6 +61,10 @@ if t.TYPE_CHECKING:
     from ._util import ParensCords
 
 
+# flake8 only shows the logs of its own logger (`flake8 -vv`)
+LOG = logging.getLogger(f"flake8.{__name__}")
+
+
 if sys.version_info < (3, 8):
     AstStr = ast.Str
 else:
@@ -65,11 +98,6 @@ AST_FIX_SPECIAL_BODIES = {
     "match": "\n    case _:\n        pass",
 }
 
-IGNORED_TYPES_FOR_PARENS = {
-    tokenize.NL,
-    tokenize.COMMENT,
-}
-
 LOGICAL_LINE_STRIPPED_TYPES = {
     tokenize.NEWLINE, tokenize.NL, tokenize.COMMENT,
     tokenize.INDENT, tokenize.DEDENT, tokenize.ENDMARKER
@@ -77,38 +105,71 @@ LOGICAL_LINE_STRIPPED_TYPES = {
 
 
 class LogicalLine:
+    __slots__ = ("line", "line_offset", "column_offset", "file_tokens",
+                 "_tokens")
+
     def __init__(
         self,
         line: str,
         line_offset: int,
         tokens: t.Optional[t.Tuple[tokenize.TokenInfo]] = None,
         column_offset: int = 0,
-        padding_line_offset: int = 0,
-        padding_column_offset: int = 0,
+        file_tokens: t.Optional[t.Sequence[tokenize.TokenInfo]] = None,
     ):
         self.line = line
         self.line_offset = line_offset
         self.column_offset = column_offset
-        self.padding_line_offset = padding_line_offset
-        self.padding_column_offset = padding_column_offset
+        # slice of the file's tokens (in file coordinates) this line is made
+        # of => no need to tokenize the line again
+        self.file_tokens = file_tokens
         self._tokens = tokens
 
     @property
     def tokens(self):
         if self._tokens is None:
-            lines = self.line.splitlines(keepends=True)
-            line_iter = iter(lines)
-            self._tokens = tuple(
-                tokenize.generate_tokens(lambda: next(line_iter))
-            )
+            if self.file_tokens is not None:
+                self._tokens = self._shift_file_tokens()
+            else:
+                line_iter = iter(split_lines(self.line, keepends=True))
+                self._tokens = tuple(
+                    tokenize.generate_tokens(lambda: next(line_iter))
+                )
         return self._tokens
 
+    @property
+    def rows(self):
+        # first and last row in the file
+        return (self.line_offset + 1,
+                self.line_offset + self.line.count("\n") + 1)
+
+    def _shift_file_tokens(self):
+        assert self.file_tokens is not None
+        physical_lines = split_lines(self.line, keepends=True)
+        first_row = self.line_offset + 1
+
+        def shift(pos):
+            row, col = pos
+            if row == first_row:
+                col -= self.column_offset
+            return row - self.line_offset, col
+
+        tokens = []
+        for token in self.file_tokens:
+            start = shift(token.start)
+            tokens.append(tokenize.TokenInfo(
+                token.type, token.string, start, shift(token.end),
+                physical_lines[start[0] - 1],
+            ))
+        return tuple(tokens)
+
     def __repr__(self):
         return f"<LogicalLine L{self.line_offset + 1} {self.line!r}>"
 
 
 @dataclass
 class ProblemRewrite:
+    __slots__ = ("pos", "replacement")
+
     pos: t.Tuple[int, int]
     replacement: t.Optional[str]
 
@@ -117,7 +178,10 @@ class PluginRedundantParentheses:
     name = __name__
     version = version
 
-    _enabled: t.ClassVar[bool] = True
+    _codes: t.ClassVar[tuple[str, ...]] = ("PAR001", "PAR002")
+    _enabled_codes: t.ClassVar[frozenset[str]] = frozenset(_codes)
+    _line_memo: t.ClassVar[LineMemo] = LineMemo()
+    _result_cache: t.ClassVar[ResultCache | None] = None
 
     def __init__(
         self,
@@ -126,30 +190,62 @@ class PluginRedundantParentheses:
         lines: t.List[str],
     ) -> None:
         self.tree = tree
-        self.file_tokens = list(file_tokens)
+        # shared with `PluginBracketsPosition`
+        self.context = FileContext.of(file_tokens)
+        self.file_tokens = self.context.tokens
         self.lines = lines
+        self.stats: t.Counter[str] = collections.Counter()
 
     @staticmethod
     def _get_logical_lines(lines, tokens):
         prev_end_line = 0
-        for token in tokens:
+        prev_end_idx = 0
+        for idx, token in enumerate(tokens):
             if token.type == tokenize.NEWLINE:
                 yield LogicalLine(
                     "".join(lines[prev_end_line:token.start[0]]),
                     prev_end_line,
+                    file_tokens=tokens[prev_end_idx:idx + 1],
                 )
                 prev_end_line = token.start[0]
+                prev_end_idx = idx + 1
 
     def run(
         self
     ) -> t.Generator[t.Tuple[int, int, str, t.Type[t.Any]], None, None]:
-        if not self._enabled:
+        if not self._enabled_codes:
             return
-        logical_lines = self._get_logical_lines(self.lines, self.file_tokens)
-        problems = self._check(logical_lines, self.tree, self.file_tokens)
+        cache = self._result_cache
+        problems = None
+        if cache is not None:
+            cache_key = cache.key(self.name, self._enabled_codes, self.lines)
+            problems = cache.get(cache_key)
+        if problems is None:
+            logical_lines = self._get_logical_lines(self.lines,
+                                                    self.file_tokens)
+            problems = list(self._check(logical_lines, self.tree,
+                                        self.context, self.stats))
+            if cache is not None:
+                cache.put(cache_key, problems)
         for line, col, msg in problems:
             yield line, col, msg, type(self)
 
+    @classmethod
+    def add_options(cls, option_manager: OptionManager) -> None:
+        # shared by both plugins
+        add_cache_options(option_manager)
+        option_manager.add_option(
+            "--picky-parentheses-line-memo-size",
+            type=int,
+            default=DEFAULT_LINE_MEMO_SIZE,
+            parse_from_config=True,
+            help=(
+                "Number of logical lines to remember the PAR001 problems of "
+                "(per process). 0 turns the memo off. "
+                "(Default: %(default)s)"
+            ),
+        )
+
     @classmethod
     def parse_options(
         cls,
@@ -162,49 +258,164 @@ class PluginRedundantParentheses:
             DecisionEngine,
         )
 
+        cls._line_memo.resize(options.picky_parentheses_line_memo_size)
+        cls._result_cache = ResultCache.from_options(options)
+        if cls._line_memo.store is not None:
+            cls._line_memo.store.close()
+        cls._line_memo.store = None
+        if cls._result_cache is not None:
+            cls._line_memo.store = cls._result_cache.line_store()
         engine = DecisionEngine(options)
-        for code in ("PAR001", "PAR002"):
-            if engine.make_decision(code) == Decision.Selected:
-                cls._enabled = True
-                return
-        cls._enabled = False
+        cls._enabled_codes = frozenset(
+            code for code in cls._codes
+            if engine.make_decision(code) == Decision.Selected
+        )
 
     @classmethod
-    def _check(cls, logical_lines, tree, file_tokens):
-        raw_problems = cls._get_raw_problems(logical_lines)
-        yield from cls._rewrite_problems(raw_problems, tree, file_tokens)
+    def _check(cls, logical_lines, tree, context, stats=None):
+        raw_problems = cls._get_raw_problems(logical_lines, tree, stats)
+        yield from cls._rewrite_problems(raw_problems, tree, context)
 
     @classmethod
-    def _get_raw_problems(cls, logical_lines):
+    def _get_raw_problems(cls, logical_lines, tree, stats=None):
+        if stats is None:
+            stats = collections.Counter()
+        checks = []
+        # the problem positions (relative to the stripped line) of the lines
+        # found in the memo and the verdicts of the other lines
+        problem_lines = []
         for logical_line in logical_lines:
             if not any(
                 token.type == tokenize.OP and token.string == "("
-                for token in logical_line.tokens
+                for token in logical_line.file_tokens
             ):
                 continue
+            file_tokens = logical_line.file_tokens
+            kinds = classify_parens(file_tokens,
+                                    find_parens_coords(file_tokens))
+            if not cls._has_candidates(file_tokens, kinds):
+                stats["lines_skipped"] += 1
+                continue
             logical_line = cls._strip_logical_line(logical_line)
-            logical_line = cls._pad_logical_line(logical_line)
-            for line, column, msg in cls._check_logical_line(logical_line):
-                column -= logical_line.padding_column_offset
-                line -= logical_line.padding_line_offset
+            positions = cls._line_memo.get(logical_line.line)
+            if positions is not None:
+                stats["line_memo_hits"] += 1
+                problem_lines.append((logical_line, positions))
+                continue
+            stats["line_memo_misses"] += 1
+            engine = RedundancyEngine(None, logical_line.tokens,
+                                      logical_line.line)
+            # brackets and braces are never redundant (outside of patterns)
+            is_case = logical_line.tokens[0].string == "case"
+            verdicts = {
+                parens_coord: engine.parens_redundant_by_tokens(parens_coord)
+                for parens_coord, kind in zip(
+                    find_parens_coords(logical_line.tokens), kinds
+                )
+                if is_case or kind not in (SUBSCRIPT, DISPLAY)
+            }
+            stats["token_verdicts"] += sum(
+                verdict is not None for verdict in verdicts.values()
+            )
+            checks.append((logical_line, engine, verdicts))
+            problem_lines.append((logical_line, verdicts))
+        undecided_checks = [
+            check for check in checks if None in check[2].values()
+        ]
+        if RedundancyEngine.supported:
+            # the file's AST already contains the nodes of every line
+            line_nodes = index_logical_lines(tree, [
+                logical_line.rows for logical_line, _, _ in undecided_checks
+            ])
+            for (logical_line, engine, _), nodes in zip(undecided_checks,
+                                                        line_nodes):
+                engine.attach_nodes(nodes, logical_line.line_offset,
+                                    logical_line.column_offset)
+        fallback_checks = []
+        for logical_line, engine, verdicts in undecided_checks:
+            cls._check_logical_line(engine, verdicts)
+            if None in verdicts.values():
+                fallback_checks.append((logical_line, verdicts))
+        stats["parses_avoided"] += len(checks) - len(fallback_checks)
+        # only lines with pairs that still need the full re-parse check need
+        # to be parsed on their own (for comparable ASTs)
+        parsed_lines = parse_batch([
+            cls._pad_line(logical_line, logical_line.line)
+            for logical_line, _ in fallback_checks
+        ])
+        for (logical_line, verdicts), line_tree in zip(fallback_checks,
+                                                       parsed_lines):
+            undecided_coords = [
+                parens_coord
+                for parens_coord, redundant in verdicts.items()
+                if redundant is None
+            ]
+            redundant_coords = set(cls._find_redundant_parens(
+                logical_line, AstFingerprint(line_tree), undecided_coords
+            ))
+            for parens_coord in undecided_coords:
+                verdicts[parens_coord] = parens_coord in redundant_coords
+        for logical_line, positions in problem_lines:
+            if isinstance(positions, dict):
+                # the verdicts of a line checked above
+                positions = tuple(
+                    parens_coord.open_
+                    for parens_coord, redundant in positions.items()
+                    if redundant
+                )
+                cls._line_memo.put(logical_line.line, positions)
+            for line, column in positions:
                 if line == 1:
                     column += logical_line.column_offset
                 line += logical_line.line_offset
-                yield line, column, msg
+                yield line, column, "PAR001: Redundant parentheses"
+        cls._line_memo.flush()
+        if stats["line_memo_hits"] or stats["line_memo_misses"]:
+            LOG.debug(
+                "PAR001 line memo: %d of %d lines found, %.1f%% hit rate in "
+                "this process",
+                stats["line_memo_hits"],
+                stats["line_memo_hits"] + stats["line_memo_misses"],
+                cls._line_memo.hit_rate * 100,
+            )
+
+    @staticmethod
+    def _has_candidates(tokens, kinds):
+        # Only grouping parentheses and generators can be redundant. The
+        # exception are the empty parentheses in `class A():` (parentheses
+        # wrapping a single pair, like `foo((a))`, come with a grouping pair).
+        if GROUPING in kinds or GENERATOR in kinds:
+            return True
+        return DEFINITION in kinds and any(
+            token.type == tokenize.NAME and token.string == "class"
+            for token in tokens
+        )
 
     @classmethod
-    def _rewrite_problems(cls, raw_problems, tree, file_tokens):
-        parens_coords = find_parens_coords(file_tokens)
+    def _rewrite_problems(cls, raw_problems, tree, context):
         raw_problems = list(raw_problems)
         raw_problems_pos = {(line, column) for line, column, _ in raw_problems}
+        if not raw_problems_pos:
+            return
+        parens_table = context.parens_coords
+        open_rows = parens_table.open_rows
+        open_cols = parens_table.open_cols
+        # in the order they are opened
         problem_coords = [
-            parens_coord
-            for parens_coord in parens_coords
-            if parens_coord.open_ in raw_problems_pos
+            parens_table[idx]
+            for idx in parens_table.open_order
+            if (open_rows[idx], open_cols[idx]) in raw_problems_pos
         ]
+        tree = ast.Module(
+            body=cls._problem_statements(
+                tree, {line for line, _ in raw_problems_pos}
+            ),
+            type_ignores=[],
+        )
         rewrites_by_pos: t.Dict[t.Tuple[int, int], ProblemRewrite] = {
             rewrite.pos: rewrite
-            for rewrite in cls._get_rewrites(problem_coords, tree, file_tokens)
+            for rewrite in cls._get_rewrites(problem_coords, tree,
+                                             context.token_table)
         }
         # raw_problems = list(raw_problems)
         for raw_problem in raw_problems:
@@ -217,129 +428,224 @@ class PluginRedundantParentheses:
                 continue
             yield line, column, rewrite.replacement
 
+    @staticmethod
+    def _problem_statements(tree, problem_rows):
+        # The top-level statements with problems in them. Only their nodes
+        # need to be looked at to find the exceptions.
+        if sys.version_info < (3, 8):
+            # no end positions to tell where a statement ends
+            return tree.body
+        body = tree.body
+        first_rows = [
+            min([stmt.lineno] + [
+                decorator.lineno
+                for decorator in getattr(stmt, "decorator_list", ())
+            ])
+            for stmt in body
+        ]
+        last_rows = [stmt.end_lineno for stmt in body]
+        return [body[idx] for idx in sorted({
+            idx
+            for row in problem_rows
+            for idx in range(bisect.bisect_left(last_rows, row),
+                             bisect.bisect_right(first_rows, row))
+        })]
+
     @staticmethod
     def _strip_logical_line(logical_line):
-        first_relevant_token = next(
-            token for token in logical_line.tokens
+        file_tokens = logical_line.file_tokens
+        first_relevant_idx = next(
+            idx for idx, token in enumerate(file_tokens)
             if token.type not in LOGICAL_LINE_STRIPPED_TYPES
         )
+        first_relevant_token = file_tokens[first_relevant_idx]
         last_relevant_token = next(
-            token for token in reversed(logical_line.tokens)
+            token for token in reversed(file_tokens)
             if token.type not in LOGICAL_LINE_STRIPPED_TYPES
         )
-        split_lines = logical_line.line.splitlines()
-        start = first_relevant_token.start[0] - 1
-        end = last_relevant_token.end[0] - 1
-        split_lines = split_lines[start:(end + 1)]
+        physical_lines = split_lines(logical_line.line)
+        start = first_relevant_token.start[0] - logical_line.line_offset - 1
+        end = last_relevant_token.end[0] - logical_line.line_offset - 1
+        physical_lines = physical_lines[start:(end + 1)]
         line_offset = logical_line.line_offset + start
         start = first_relevant_token.start[1]
         end = last_relevant_token.end[1]
-        if len(split_lines) == 1:
-            split_lines[0] = split_lines[0][start:(end + 1)]
+        if len(physical_lines) == 1:
+            physical_lines[0] = physical_lines[0][start:(end + 1)]
         else:
-            split_lines[0] = split_lines[0][start:]
-            split_lines[-1] = split_lines[-1][:(end + 1)]
+            physical_lines[0] = physical_lines[0][start:]
+            physical_lines[-1] = physical_lines[-1][:(end + 1)]
         column_offset = logical_line.column_offset + start
         return LogicalLine(
-            line="\n".join(split_lines),
+            line="\n".join(physical_lines),
             line_offset=line_offset,
-            column_offset=column_offset
+            column_offset=column_offset,
+            file_tokens=file_tokens[first_relevant_idx:],
         )
 
     @staticmethod
-    def _pad_logical_line(logical_line):
+    def _pad_line(logical_line, line):
+        # makes `line` (`logical_line` or a modified version of it) parsable
+        # on its own, e.g., `else:` or decorators
         tokens = logical_line.tokens
         if not tokens:
-            return logical_line
+            return line
         needs_body = logical_line.line.rstrip().endswith(":")
         is_decorator = logical_line.line.lstrip().startswith("@")
         ast_fix_prefix = AST_FIX_PREFIXES.get(tokens[0].string)
         if not (needs_body or is_decorator or ast_fix_prefix):
-            return logical_line
+            return line
 
-        line = logical_line.line
-        padding_line_offset = 0
-        padding_column_offset = 0
         if is_decorator:
             line += "\ndef f():"
             needs_body = True
         if needs_body:
-            keyword = line.strip().split()[0]
+            keyword = logical_line.line.strip().split()[0]
             line += AST_FIX_SPECIAL_BODIES.get(keyword, "\n    pass")
         if ast_fix_prefix:
             extra_indent = ast_fix_prefix.rsplit("\n", 1)[-1]
             if extra_indent:
                 line = "\n".join(extra_indent + s for s in line.split("\n"))
-                padding_column_offset += len(extra_indent)
                 ast_fix_prefix = ast_fix_prefix[:-len(extra_indent)]
             line = ast_fix_prefix + line
-            padding_line_offset += ast_fix_prefix.count("\n")
-        return LogicalLine(
-            line=line,
-            line_offset=logical_line.line_offset,
-            column_offset=logical_line.column_offset,
-            padding_line_offset=padding_line_offset,
-            padding_column_offset=padding_column_offset,
+        return line
 
-        )
+    @classmethod
+    def _check_logical_line(cls, engine, verdicts):
+        # decide the pairs the tokens couldn't decide in place
+        for parens_coord, redundant in verdicts.items():
+            if redundant is None:
+                redundant = engine.parens_redundant(parens_coord)
+            if redundant is None:
+                # construct the engine can't classify => fall back to
+                # removing the parentheses and comparing the ASTs
+                redundant = cls._parens_check_segment(engine, parens_coord)
+            verdicts[parens_coord] = redundant
 
     @classmethod
-    def _check_logical_line(cls, logical_line):
-        parens_coords = find_parens_coords(logical_line.tokens)
-        tree = ast.parse(logical_line.line)
-        for parens_coord in parens_coords:
-            if not cls._parens_check_optional(logical_line, tree,
-                                              parens_coord):
+    def _find_redundant_parens(cls, logical_line, baseline, parens_coords):
+        # Group testing: remove several non-overlapping pairs at once. If the
+        # AST does not change, all of them are redundant. Otherwise, bisect.
+        # Most pairs that get here are not redundant, so the group size
+        # starts at 1 and only doubles while the groups keep being
+        # redundant.
+        group_size = 1
+        idx = 0
+        while idx < len(parens_coords):
+            group = [parens_coords[idx]]
+            idx += 1
+            while (
+                len(group) < group_size
+                and idx < len(parens_coords)
+                # pairs come in closing order => only need to check whether
+                # the next pair encloses the last one
+                and parens_coords[idx].open_ > group[-1].close
+            ):
+                group.append(parens_coords[idx])
+                idx += 1
+            if cls._parens_check_optional(logical_line, baseline, *group):
+                yield from group
+                group_size *= 2
                 continue
-            yield (*parens_coord.open_, "PAR001: Redundant parentheses")
+            group_size = 1
+            if len(group) > 1:
+                yield from cls._bisect_redundant_parens(logical_line,
+                                                        baseline, group)
+
+    @classmethod
+    def _bisect_redundant_parens(cls, logical_line, baseline, parens_coords):
+        mid = len(parens_coords) // 2
+        for half in (parens_coords[:mid], parens_coords[mid:]):
+            if cls._parens_check_optional(logical_line, baseline, *half):
+                yield from half
+            elif len(half) > 1:
+                yield from cls._bisect_redundant_parens(logical_line,
+                                                        baseline, half)
 
     @classmethod
-    def _parens_check_optional(cls, logical_line, tree, parens_coord):
-        line_without_parens = cls._remove_parens(logical_line, parens_coord)
+    def _parens_check_optional(cls, logical_line, baseline, *parens_coords):
+        line_without_parens = cls._pad_line(
+            logical_line, cls._remove_parens(logical_line, *parens_coords)
+        )
         try:
             tree_without_parens = ast.parse(line_without_parens)
         except (ValueError, SyntaxError):
             return False
-        return ast.dump(tree) == ast.dump(tree_without_parens)
+        return baseline.matches(tree_without_parens)
 
-    @staticmethod
-    def _remove_parens(logical_line, parens_coord):
+    @classmethod
+    def _parens_check_segment(cls, engine, parens_coord):
+        # only re-parse the smallest expression enclosing the parentheses
+        enclosing = engine.enclosing_expression(parens_coord)
+        if enclosing is None:
+            return None
+        node, (start_line, start_col, end_line, end_col) = enclosing
         open_, space, replacement, close, _ = parens_coord
-        physical_lines = logical_line.line.splitlines(keepends=True)
-
-        idx_open_line = open_[0] - 1
-        physical_lines[idx_open_line] = (
-            physical_lines[idx_open_line][:open_[1]]
-            + replacement
-            + physical_lines[idx_open_line][space:]
+        segment = LogicalLine(
+            "".join(engine.lines[start_line - 1:end_line]), start_line - 1
         )
-        shift = 0
-        if open_[0] == close[0]:
-            shift -= (space - open_[1]) - len(replacement)
-        idx_close_line = close[0] - 1
-        shifted_close_col = close[1] + shift
-        physical_lines[idx_close_line] = (
-            physical_lines[idx_close_line][:shifted_close_col]
-            + " "
-            + physical_lines[idx_close_line][shifted_close_col + 1:]
+        line_without_parens = cls._remove_parens(
+            segment,
+            parens_coord._replace(
+                open_=(open_[0] - segment.line_offset, open_[1]),
+                close=(close[0] - segment.line_offset, close[1]),
+            ),
         )
+        physical_lines = split_lines(line_without_parens, keepends=True)
+        if open_[0] == end_line:
+            end_col -= (space - open_[1]) - len(replacement)
+        physical_lines[-1] = physical_lines[-1][:end_col]
+        physical_lines[0] = physical_lines[0][start_col:]
+        try:
+            tree_without_parens = ast.parse(
+                "(" + "".join(physical_lines) + ")", mode="eval"
+            )
+        except (ValueError, SyntaxError):
+            return False
+        return ast_equal(node, tree_without_parens.body)
+
+    @staticmethod
+    def _remove_parens(logical_line, *parens_coords):
+        physical_lines = split_lines(logical_line.line, keepends=True)
+        # remove back to front, so the coordinates of the remaining pairs
+        # stay valid (the pairs must not overlap)
+        for parens_coord in sorted(parens_coords, reverse=True):
+            open_, space, replacement, close, _ = parens_coord
+            idx_open_line = open_[0] - 1
+            physical_lines[idx_open_line] = (
+                physical_lines[idx_open_line][:open_[1]]
+                + replacement
+                + physical_lines[idx_open_line][space:]
+            )
+            shift = 0
+            if open_[0] == close[0]:
+                shift -= (space - open_[1]) - len(replacement)
+            idx_close_line = close[0] - 1
+            shifted_close_col = close[1] + shift
+            physical_lines[idx_close_line] = (
+                physical_lines[idx_close_line][:shifted_close_col]
+                + " "
+                + physical_lines[idx_close_line][shifted_close_col + 1:]
+            )
         return "".join(physical_lines)
 
     @classmethod
     def _get_rewrites(
-        cls, parens_coords: t.List[ParensCords], tree, tokens
+        cls, parens_coords: t.List[ParensCords], tree, token_table
     ) -> t.Generator[ProblemRewrite, None, None]:
         # exceptions made for parentheses that are not strictly necessary
         # but help readability
+        # `parens_coords` must be in the order they are opened
         if not parens_coords:
             return
-        parens_coords = sorted(parens_coords, key=lambda x: x.token_indexes[0])
         yield from cls._get_exceptions_for_neighboring_parens(parens_coords,
-                                                              tokens)
-        yield from cls._get_exceptions_from_ast(parens_coords, tree, tokens)
+                                                              token_table)
+        yield from cls._get_exceptions_from_ast(parens_coords, tree,
+                                                token_table)
 
     @classmethod
-    def _get_exceptions_from_ast(cls, sorted_parens_coords, tree, tokens):
+    def _get_exceptions_from_ast(cls, sorted_parens_coords, tree,
+                                 token_table):
         special_ops_pair_exceptions = (
             ast.BinOp, ast.BoolOp, ast.UnaryOp, ast.Compare, ast.Await,
             ast.IfExp
@@ -347,24 +653,25 @@ class PluginRedundantParentheses:
         comprehension_exceptions = (
             ast.ListComp, ast.SetComp, ast.DictComp, ast.GeneratorExp
         )
-        nodes = list(cls._nodes_with_pos_and_parents(tree))
-        nodes.sort(key=lambda x: (x[1], len(x[3])))
+        node_table = NodeTable(tree)
 
-        yield from cls._tuple_exceptions(sorted_parens_coords, nodes, tokens)
+        yield from cls._tuple_exceptions(sorted_parens_coords, node_table,
+                                         token_table)
 
-        nodes_idx = 0
         last_exception_node = None
         skip_node = False
         rewrite_buffer = None
         for parens_coord in sorted_parens_coords:
-            node, pos, end, parents = nodes[nodes_idx]
-            while not cls._node_in_parens(
-                parens_coord, node, pos, end, tokens
-            ):
-                nodes_idx += 1
-                if nodes_idx >= len(nodes):
-                    return
-                node, pos, end, parents = nodes[nodes_idx]
+            open_, _, _, close, _ = parens_coord
+            for row in node_table.enclosed(open_, (close[0], close[1] + 1)):
+                node = node_table.nodes[row]
+                pos = node_table.starts[row]
+                end = node_table.ends[row]
+                if cls._node_in_parens(parens_coord, node, pos, end):
+                    break
+            else:
+                return
+            parent = node_table.parent(row)
             if skip_node:
                 if last_exception_node is not node:
                     skip_node = False
@@ -377,35 +684,31 @@ class PluginRedundantParentheses:
                 rewrite_buffer = None
 
             if (
-                parents
-                and isinstance(parents[0], (ast.Slice, ast.Starred))
+                isinstance(parent, (ast.Slice, ast.Starred))
                 and isinstance(node, special_ops_pair_exceptions)
             ):
                 rewrite_buffer = ProblemRewrite(parens_coord.open_, None)
                 last_exception_node = node
                 continue
             if (
-                parents
-                and isinstance(parents[0], comprehension_exceptions)
+                isinstance(parent, comprehension_exceptions)
                 and isinstance(node, special_ops_pair_exceptions)
-                and node in (getattr(parents[0], attr, None)
+                and node in (getattr(parent, attr, None)
                              for attr in ("elt", "key", "value"))
             ):
                 rewrite_buffer = ProblemRewrite(parens_coord.open_, None)
                 last_exception_node = node
                 continue
             if (
-                parents
-                and isinstance(parents[0], special_ops_pair_exceptions)
+                isinstance(parent, special_ops_pair_exceptions)
                 and isinstance(node, special_ops_pair_exceptions)
             ):
                 rewrite_buffer = ProblemRewrite(parens_coord.open_, None)
                 last_exception_node = node
                 continue
             if (
-                parents
-                and isinstance(parents[0], ast.keyword)
-                and parents[0].arg is None
+                isinstance(parent, ast.keyword)
+                and parent.arg is None
                 and isinstance(node, special_ops_pair_exceptions)
             ):
                 rewrite_buffer = ProblemRewrite(parens_coord.open_, None)
@@ -413,9 +716,8 @@ class PluginRedundantParentheses:
                 continue
             if (
                 isinstance(node, ast.Tuple)
-                and parents
-                and isinstance(parents[0], ast.Assign)
-                and node in parents[0].targets
+                and isinstance(parent, ast.Assign)
+                and node in parent.targets
             ):
                 rewrite_buffer = ProblemRewrite(
                     parens_coord.open_,
@@ -424,26 +726,23 @@ class PluginRedundantParentheses:
                 last_exception_node = node
                 continue
             if (
-                parents
-                and isinstance(parents[0], ast.comprehension)
-                and (node in parents[0].ifs or node == parents[0].iter)
+                isinstance(parent, ast.comprehension)
+                and (node in parent.ifs or node == parent.iter)
                 and (parens_coord.open_[0] != pos[0] or pos[0] != end[0])
             ):
                 rewrite_buffer = ProblemRewrite(parens_coord.open_, None)
                 last_exception_node = node
                 continue
             if (
-                parents
-                and isinstance(parents[0], ast.keyword)
+                isinstance(parent, ast.keyword)
                 and (parens_coord.open_[0] != pos[0] or pos[0] != end[0])
             ):
                 rewrite_buffer = ProblemRewrite(parens_coord.open_, None)
                 last_exception_node = node
                 continue
             if (
-                parents
-                and isinstance(parents[0], ast.arguments)
-                and node in parents[0].defaults
+                isinstance(parent, ast.arguments)
+                and node in parent.defaults
                 and (parens_coord.open_[0] != pos[0] or pos[0] != end[0])
             ):
                 rewrite_buffer = ProblemRewrite(parens_coord.open_, None)
@@ -457,28 +756,27 @@ class PluginRedundantParentheses:
                 last_exception_node = node
                 continue
             if (
-                parents
-                and isinstance(
-                    parents[0],
+                isinstance(
+                    parent,
                     (ast.Tuple, ast.List, ast.Call, ast.keyword),
                 )
                 and isinstance(node, AstStr)
             ):
-                tokens_slice = slice(parens_coord.token_indexes[0] + 1,
-                                     parens_coord.token_indexes[1])
-                string_tokens = [
-                    token for token in tokens[tokens_slice]
-                    if token.type == tokenize.STRING
+                string_rows = [
+                    token_table.start_rows[token]
+                    for token in range(parens_coord.token_indexes[0] + 1,
+                                       parens_coord.token_indexes[1])
+                    if token_table.types[token] == tokenize.STRING
                 ]
-                if not string_tokens:
+                if not string_rows:
                     continue
-                if string_tokens[0].start[0] != string_tokens[-1].start[0]:
+                if string_rows[0] != string_rows[-1]:
                     rewrite_buffer = ProblemRewrite(parens_coord.open_, None)
                     last_exception_node = node
 
-                    if isinstance(parents[0], ast.Call):
-                        prev_token = tokens[parens_coord.token_indexes[0] - 1]
-                        if prev_token.type == tokenize.NAME:
+                    if isinstance(parent, ast.Call):
+                        prev_token = parens_coord.token_indexes[0] - 1
+                        if token_table.types[prev_token] == tokenize.NAME:
                             # For function calls, we want the multi-line string
                             # to provide an exception for the outermost
                             # parenthesis pair if that is the one enclosing the
@@ -493,77 +791,27 @@ class PluginRedundantParentheses:
             yield rewrite_buffer
 
     @classmethod
-    def _tuple_exceptions(cls, sorted_parens_coords, sorted_nodes, tokens):
+    def _tuple_exceptions(cls, sorted_parens_coords, node_table,
+                          token_table):
         # Tuples need extra care, because the parentheses are not included
         # in the ast position (unless necessary) in Python 3.7
         # BUT, they are included in Python 3.8+
-        tokens = [token for token in tokens
-                  if token.type not in IGNORED_TYPES_FOR_PARENS]
-        tokens_idx = 0
-        parens_coord_idx = 0
-        for node, pos, _, _ in sorted_nodes:
-            if not isinstance(node, ast.Tuple):
-                continue
+        for parens_coord in sorted_parens_coords:
             if sys.version_info >= (3, 8):
-                while tokens[tokens_idx].start <= pos:
-                    tokens_idx += 1
+                tuple_pos = parens_coord.open_
             else:
-                while tokens[tokens_idx].start < pos:
-                    tokens_idx += 1
-            if not tokens_idx:
-                continue
-            prev_token_pos = tokens[tokens_idx - 1].start
-            parens_coord = sorted_parens_coords[parens_coord_idx]
-            while parens_coord.open_ < prev_token_pos:
-                parens_coord_idx += 1
-                if parens_coord_idx >= len(sorted_parens_coords):
-                    return
-                parens_coord = sorted_parens_coords[parens_coord_idx]
-            if parens_coord.open_ == prev_token_pos:
+                tuple_pos = token_table.start(token_table.next_significant(
+                    parens_coord.token_indexes[0] + 1
+                ))
+            if any(
+                isinstance(node_table.nodes[row], ast.Tuple)
+                for row in node_table.starting_at(tuple_pos)
+            ):
                 yield ProblemRewrite(parens_coord.open_, None)
 
-    @classmethod
-    def _nodes_with_pos_and_parents(cls, node, parents=()):
-        pos = cls._node_pos(node, None)
-        end = (0, 0) if pos is None else pos
-        child_parents = (node, *parents)
-        for _, value in ast.iter_fields(node):
-            if isinstance(value, list):
-                for item in value:
-                    if isinstance(item, ast.AST):
-                        for child in cls._nodes_with_pos_and_parents(
-                            item, child_parents
-                        ):
-                            yield child
-                            end = max(end, child[2])
-            elif isinstance(value, ast.AST):
-                for child in cls._nodes_with_pos_and_parents(
-                    value, child_parents
-                ):
-                    yield child
-                    end = max(end, child[2])
-
-        if pos is not None:
-            yield node, pos, cls._node_end(node, end), parents
-
-    @staticmethod
-    def _node_pos(node, default):
-        if not hasattr(node, "lineno") or not hasattr(node, "col_offset"):
-            return default
-        return node.lineno, node.col_offset
-
-    @staticmethod
-    def _node_end(node, default):
-        if (
-            not hasattr(node, "end_lineno")
-            or not hasattr(node, "end_col_offset")
-        ):
-            return default
-        return node.end_lineno, node.end_col_offset
-
     @staticmethod
     def _get_exceptions_for_neighboring_parens(sorted_optional_parens_coords,
-                                               tokens):
+                                               token_table):
         if len(sorted_optional_parens_coords) < 2:
             return
         coords2 = sorted_optional_parens_coords[0]
@@ -576,14 +824,12 @@ class PluginRedundantParentheses:
             open_end = coords2.token_indexes[0]
             close_start = coords2.token_indexes[1] + 1
             close_end = coords1.token_indexes[1]
-            tokens_between = (tokens[open_start:open_end]
-                              + tokens[close_start:close_end])
             if not open_start <= open_end < close_start <= close_end:
                 coords_are_neighboring = False
             else:
-                coords_are_neighboring = all(
-                    token.type in IGNORED_TYPES_FOR_PARENS
-                    for token in tokens_between
+                coords_are_neighboring = (
+                    token_table.all_insignificant(open_start, open_end)
+                    and token_table.all_insignificant(close_start, close_end)
                 )
             if not coords_are_neighboring and prev_were_neighboring:
                 yield ProblemRewrite(coords1.open_, None)
@@ -593,7 +839,7 @@ class PluginRedundantParentheses:
             yield ProblemRewrite(coords2.open_, None)
 
     @staticmethod
-    def _node_in_parens(parens_coord, node, pos, end, tokens):
+    def _node_in_parens(parens_coord, node, pos, end):
         open_, _, _, close, _ = parens_coord
         close = close[0], close[1] + 1
         if (
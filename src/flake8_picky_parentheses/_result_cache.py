@@ -0,0 +1,242 @@
+# Copyright Rouven Bauer
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import sys
+import tempfile
+import time
+import typing as t
+
+from ._line_memo import LineStore
+from ._meta import version
+
+if t.TYPE_CHECKING:
+    from argparse import Namespace
+
+    from flake8.options.manager import OptionManager
+
+# Opt-in on-disk cache of the problems a plugin reported for a file. An entry
+# is keyed by everything the problems depend on: the file's content, the
+# plugin and its version, the Python version (the ASTs differ), and the
+# enabled codes. The file's name is not part of the key, so copies of a file
+# share an entry.
+# flake8 runs the checks in multiple processes that share the cache: entries
+# are written to a temporary file and renamed into place, so readers never
+# see partial entries. Every error is treated like a miss; a broken cache
+# must never break linting.
+# The directory also holds a `LineStore` with the problems of single logical
+# lines, so editing a file doesn't mean all of its lines need checking again.
+
+Problem = t.Tuple[int, int, str]
+
+DEFAULT_MAX_SIZE = 256  # MiB
+DEFAULT_MAX_AGE = 30  # days
+_MIB = 1024 * 1024
+_DAY = 24 * 60 * 60
+# flake8 parses the options once per worker process => compact at most once
+# in this many seconds
+COMPACT_INTERVAL = 3600
+_COMPACT_MARKER = ".compacted"
+_LINE_STORE = "lines.sqlite"
+_TMP_PREFIX = ".tmp-"
+
+
+def add_cache_options(option_manager: OptionManager) -> None:
+    option_manager.add_option(
+        "--picky-parentheses-cache-dir",
+        default=None,
+        parse_from_config=True,
+        help=(
+            "Directory to cache the problems found in files in. Unchanged "
+            "files are not checked again. (Default: no cache)"
+        ),
+    )
+    option_manager.add_option(
+        "--picky-parentheses-cache-max-size",
+        type=int,
+        default=DEFAULT_MAX_SIZE,
+        parse_from_config=True,
+        help=(
+            "Size in MiB the cache directory is trimmed to (dropping the "
+            "least recently used entries first). (Default: %(default)s)"
+        ),
+    )
+    option_manager.add_option(
+        "--picky-parentheses-cache-max-age",
+        type=int,
+        default=DEFAULT_MAX_AGE,
+        parse_from_config=True,
+        help=(
+            "Number of days after which unused cache entries are removed. "
+            "(Default: %(default)s)"
+        ),
+    )
+
+
+class ResultCache:
+    def __init__(
+        self,
+        directory: str,
+        max_size: int = DEFAULT_MAX_SIZE * _MIB,
+        max_age: float = DEFAULT_MAX_AGE * _DAY,
+    ) -> None:
+        # `max_size` in bytes, `max_age` in seconds
+        self.directory = directory
+        self.max_size = max_size
+        self.max_age = max_age
+        self.hits = 0
+        self.misses = 0
+
+    @classmethod
+    def from_options(cls, options: Namespace) -> ResultCache | None:
+        directory = options.picky_parentheses_cache_dir
+        if not directory:
+            return None
+        cache = cls(
+            os.path.abspath(os.path.expanduser(directory)),
+            options.picky_parentheses_cache_max_size * _MIB,
+            options.picky_parentheses_cache_max_age * _DAY,
+        )
+        cache.compact_if_due()
+        return cache
+
+    @staticmethod
+    def key(
+        plugin: str, codes: t.Iterable[str], lines: t.Iterable[str]
+    ) -> str:
+        hash_ = hashlib.sha256()
+        for part in (plugin, version, sys.version, ",".join(sorted(codes))):
+            hash_.update(part.encode("utf-8"))
+            hash_.update(b"\0")
+        for line in lines:
+            hash_.update(line.encode("utf-8", "surrogatepass"))
+        return hash_.hexdigest()
+
+    def line_store(self) -> LineStore:
+        return LineStore(os.path.join(self.directory, _LINE_STORE))
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], key + ".json")
+
+    def get(self, key: str) -> list[Problem] | None:
+        path = self._path(key)
+        try:
+            with open(path, encoding="utf-8") as fd:
+                problems = [
+                    (int(line), int(col), str(msg))
+                    for line, col, msg in json.load(fd)
+                ]
+        except (OSError, ValueError, TypeError):
+            self.misses += 1
+            return None
+        try:
+            # the age of an entry is the time since it was last used
+            os.utime(path)
+        except OSError:
+            # e.g., a read-only cache: the entry is still good
+            pass
+        self.hits += 1
+        return problems
+
+    def put(self, key: str, problems: t.Sequence[Problem]) -> None:
+        path = self._path(key)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(
+                dir=os.path.dirname(path), prefix=_TMP_PREFIX
+            )
+            try:
+                with os.fdopen(fd, "w", encoding="utf-8") as tmp_file:
+                    json.dump(problems, tmp_file)
+                os.replace(tmp_path, path)
+            except BaseException:
+                os.unlink(tmp_path)
+                raise
+        except OSError:
+            pass
+
+    def compact_if_due(self) -> None:
+        marker = os.path.join(self.directory, _COMPACT_MARKER)
+        try:
+            if time.time() - os.stat(marker).st_mtime < COMPACT_INTERVAL:
+                return
+        except OSError:
+            pass
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            with open(marker, "w"):
+                pass
+        except OSError:
+            return
+        self.compact()
+
+    def compact(self) -> None:
+        # Drop entries that were not used for `max_age`, then the least
+        # recently used ones until the cache fits into `max_size`. The line
+        # store gets a quarter of that.
+        # Other processes might compact concurrently => files can vanish.
+        line_store_size = self.max_size // 4
+        line_store = self.line_store()
+        try:
+            line_store.compact(self.max_age, line_store_size)
+        finally:
+            line_store.close()
+        now = time.time()
+        entries = []
+        for shard in self._listdir(self.directory):
+            shard_path = os.path.join(self.directory, shard)
+            if len(shard) != 2 or not os.path.isdir(shard_path):
+                continue
+            for name in self._listdir(shard_path):
+                path = os.path.join(shard_path, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                age = now - stat.st_mtime
+                if name.startswith(_TMP_PREFIX):
+                    # left behind by a writer that was killed
+                    if age > COMPACT_INTERVAL:
+                        self._unlink(path)
+                    continue
+                if age > self.max_age:
+                    self._unlink(path)
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+        size = sum(entry_size for _, entry_size, _ in entries)
+        entries.sort()
+        for _, entry_size, path in entries:
+            if size <= self.max_size - line_store_size:
+                break
+            self._unlink(path)
+            size -= entry_size
+
+    @staticmethod
+    def _listdir(path: str) -> list[str]:
+        try:
+            return os.listdir(path)
+        except OSError:
+            return []
+
+    @staticmethod
+    def _unlink(path: str) -> None:
+        try:
+            os.unlink(path)
+        except OSError:
+            pass
@@ -0,0 +1,99 @@
+# Copyright Rouven Bauer
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+from __future__ import annotations
+
+from array import array
+import tokenize
+import typing as t
+
+# The tokens of a file as columns of plain numbers (a struct of arrays), for
+# the loops that look at many tokens. Reading `types[idx]` is a lot cheaper
+# than `tokens[idx].type` (a `TokenInfo` is a named tuple of nested tuples)
+# and the columns take a few bytes per token.
+# A token is significant unless it's a comment or a line break within
+# brackets (`NL`).
+# The strings and lines of the tokens are not in the table; look them up in
+# `tokens`.
+
+INSIGNIFICANT_TYPES = frozenset((tokenize.NL, tokenize.COMMENT))
+LINE_BREAK_TYPES = frozenset((tokenize.NL, tokenize.NEWLINE))
+
+
+class TokenTable:
+    types: array[int]
+    start_rows: array[int]
+    start_cols: array[int]
+    end_rows: array[int]
+    end_cols: array[int]
+    significant: array[int]
+    next_line_breaks: array[int]
+
+    def __init__(self, tokens: t.Sequence[tokenize.TokenInfo]) -> None:
+        self.tokens = tokens
+
+    def __getattr__(self, name: str) -> array[int]:
+        # The columns are built on first use; most checks only need a few
+        # of them. Indexing beats attribute access on `TokenInfo`s.
+        tokens = self.tokens
+        if name == "types":
+            column = array("B", [token[0] for token in tokens])
+        elif name == "start_rows":
+            column = array("i", [token[2][0] for token in tokens])
+        elif name == "start_cols":
+            column = array("i", [token[2][1] for token in tokens])
+        elif name == "end_rows":
+            column = array("i", [token[3][0] for token in tokens])
+        elif name == "end_cols":
+            column = array("i", [token[3][1] for token in tokens])
+        elif name == "significant":
+            column = array("B", [
+                type_ not in INSIGNIFICANT_TYPES for type_ in self.types
+            ])
+        elif name == "next_line_breaks":
+            # index of the first `NL` or `NEWLINE` token at or after the
+            # token (the number of tokens if there is none)
+            column = array("i")
+            prev_break = -1
+            for line_break in [
+                idx for idx, type_ in enumerate(self.types)
+                if type_ in LINE_BREAK_TYPES
+            ]:
+                column.extend(array("i", [line_break])
+                              * (line_break - prev_break))
+                prev_break = line_break
+            column.extend(array("i", [len(tokens)])
+                          * (len(tokens) - 1 - prev_break))
+        else:
+            raise AttributeError(name)
+        setattr(self, name, column)
+        return column
+
+    def __len__(self) -> int:
+        return len(self.tokens)
+
+    def start(self, idx: int) -> tuple[int, int]:
+        return self.start_rows[idx], self.start_cols[idx]
+
+    def next_significant(self, idx: int) -> int:
+        # index of the first significant token at `idx` or after it
+        significant = self.significant
+        while not significant[idx]:
+            idx += 1
+        return idx
+
+    def all_insignificant(self, start: int, end: int) -> bool:
+        # whether the tokens in [start, end) are all insignificant
+        return not any(self.significant[start:end])
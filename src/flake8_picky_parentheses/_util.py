@@ -15,12 +15,25 @@
 
 from __future__ import annotations
 
+from array import array
+import functools
+import keyword
 import tokenize
 import typing as t
 
+from ._token_table import TokenTable
+
 OPEN_LIST = ["[", "{", "("]
 CLOSE_LIST = ["]", "}", ")"]
 
+# kinds of bracket pairs (see `classify_parens`)
+CALL = "call"
+DEFINITION = "definition"
+SUBSCRIPT = "subscript"
+DISPLAY = "display"
+GROUPING = "grouping"
+GENERATOR = "generator"
+
 
 class ParensCords(t.NamedTuple):
     open_: tuple[int, int]
@@ -30,8 +43,85 @@ class ParensCords(t.NamedTuple):
     token_indexes: tuple[int, int]
 
 
+# bracket kinds of `ParensTable.kinds`
+_KINDS = {bracket: kind for kind, bracket in enumerate(OPEN_LIST)}
+_MATCHING_KINDS = {bracket: kind for kind, bracket in enumerate(CLOSE_LIST)}
+# open brackets as kind + 1, closing brackets as -(kind + 1)
+_BRACKET_CODES = {
+    **{bracket: kind + 1 for bracket, kind in _KINDS.items()},
+    **{bracket: -kind - 1 for bracket, kind in _MATCHING_KINDS.items()},
+}
+
+# `ParensTable` matches the brackets of files with at least this many tokens
+# with NumPy (if installed). Below, setting up the arrays (and importing
+# NumPy) costs more than the plain scan saves.
+NUMPY_MIN_TOKENS = 20_000
+
+
+@functools.lru_cache(maxsize=None)
+def _numpy() -> t.Any:
+    # NumPy is optional and only imported once a file is large enough
+    try:
+        import numpy  # type: ignore[import]
+    except ImportError:
+        return None
+    return numpy
+
+
+def _scan_parens(
+    tokens: t.Sequence[tokenize.TokenInfo]
+) -> t.Iterator[tuple[int, int, str, int, int, int, int, int, int]]:
+    # The pairs in the order they are closed, in one pass. Per pair:
+    #  * open token index, open end col, replacement, close token index
+    #  * kind (index in `OPEN_LIST`)
+    #  * depth (number of enclosing pairs)
+    #  * the number of the pair and of its parent (-1 if none) in the order
+    #    of opening
+    #  * number of pairs directly within the pair
+    # per open bracket: open token index, open end col, replacement, kind,
+    # number in the opening order, number of children so far
+    opening_stack: list[list[t.Any]] = []
+    open_count = 0
+    last_line = -1
+    for i, (type_, string, start, end, line) in enumerate(tokens):
+        first_in_line = last_line != start[0]
+        last_line = end[0]
+        if type_ != tokenize.OP:
+            continue
+        kind = _KINDS.get(string)
+        if kind is not None:
+            if not first_in_line:
+                open_end_col, replacement = end[1], " "
+            elif tokens[i + 1].start[0] == end[0]:
+                open_end_col, replacement = tokens[i + 1].start[1], ""
+            else:
+                # there is only this opening parenthesis on this line
+                open_end_col, replacement = len(line) - 2, ""
+            opening_stack.append(
+                [i, open_end_col, replacement, kind, open_count, 0]
+            )
+            open_count += 1
+            continue
+        kind = _MATCHING_KINDS.get(string)
+        if kind is None:
+            continue
+        open_idx, open_end_col, replacement, open_kind, open_number, \
+            child_count = opening_stack.pop()
+        assert open_kind == kind
+        if opening_stack:
+            parent = opening_stack[-1]
+            parent[5] += 1
+            parent_open_number = parent[4]
+        else:
+            parent_open_number = -1
+        yield (
+            open_idx, open_end_col, replacement, i, kind, len(opening_stack),
+            open_number, parent_open_number, child_count,
+        )
+
+
 def find_parens_coords(
-    tokens: list[tokenize.TokenInfo]
+    tokens: t.Sequence[tokenize.TokenInfo]
 ) -> list[ParensCords]:
     # return parentheses paris in the form
     # (
@@ -39,35 +129,331 @@ def find_parens_coords(
     #   open_end_col,
     #   replacement,
     #   (close_line, close_col)
+    #   (open_token_index, close_token_index)
     # )
-    opening_stack: list[tuple[tuple[int, int], int, str, str, int]] = []
-    parentheses_pairs = []
-    last_line = -1
-    for i in range(len(tokens)):
-        first_in_line = last_line != tokens[i].start[0]
-        last_line = tokens[i].end[0]
-        if tokens[i].type == tokenize.OP:
-            if tokens[i].string in OPEN_LIST:
-                if not first_in_line:
-                    opening_stack.append((tokens[i].start, tokens[i].end[1],
-                                          " ", tokens[i].string, i))
-                    continue
-                if tokens[i + 1].start[0] == tokens[i].end[0]:
-                    opening_stack.append((tokens[i].start,
-                                          tokens[i + 1].start[1], "",
-                                          tokens[i].string, i))
-                    continue
-                # there is only this opening parenthesis on this line
-                opening_stack.append((tokens[i].start, len(tokens[i].line) - 2,
-                                      "", tokens[i].string, i))
-
-            if tokens[i].string in CLOSE_LIST:
-                opening = opening_stack.pop()
-                assert (OPEN_LIST.index(opening[3])
-                        == CLOSE_LIST.index(tokens[i].string))
-                token_indexes = (opening[4], i)
-                parentheses_pairs.append(
-                    ParensCords(*opening[0:3], tokens[i].start, token_indexes)
+    return [
+        ParensCords(tokens[open_idx].start, open_end_col, replacement,
+                    tokens[close_idx].start, (open_idx, close_idx))
+        for open_idx, open_end_col, replacement, close_idx, *_
+        in _scan_parens(tokens)
+    ]
+
+
+class ParensTable(t.Sequence[ParensCords]):
+    # All pairs of brackets of a file, in the order they are closed, like
+    # `find_parens_coords` returns them. Files can have hundreds of thousands
+    # of them => the parts of the pairs are kept in parallel array columns
+    # and a `ParensCords` is only made when a pair is looked at.
+    # The nesting of the pairs is recorded, too: their depth, their parent,
+    # the number of their children, and their order of opening. Pairs are
+    # referred to by their index in the table.
+
+    def __init__(
+        self,
+        tokens: t.Sequence[tokenize.TokenInfo],
+        token_table: TokenTable | None = None,
+    ) -> None:
+        if (
+            len(tokens) >= NUMPY_MIN_TOKENS
+            and _numpy() is not None
+            and self._match_with_numpy(tokens, token_table)
+        ):
+            return
+        self._scan(tokens)
+
+    def _scan(self, tokens: t.Sequence[tokenize.TokenInfo]) -> None:
+        self.open_rows = array("i")
+        self.open_cols = array("i")
+        self.open_end_cols = array("i")
+        # whether the replacement is " " (else "")
+        self.spaced = array("B")
+        self.close_rows = array("i")
+        self.close_cols = array("i")
+        self.open_indexes = array("i")
+        self.close_indexes = array("i")
+        # index in `OPEN_LIST`
+        self.kinds = array("B")
+        self.depths = array("i")
+        self.child_counts = array("i")
+        # the pairs in the order they are opened
+        self.open_order = array("i")
+        open_numbers = array("i")
+        parent_open_numbers = array("i")
+        for (
+            open_idx, open_end_col, replacement, close_idx, kind, depth,
+            open_number, parent_open_number, child_count
+        ) in _scan_parens(tokens):
+            open_row, open_col = tokens[open_idx].start
+            close_row, close_col = tokens[close_idx].start
+            self.open_rows.append(open_row)
+            self.open_cols.append(open_col)
+            self.open_end_cols.append(open_end_col)
+            self.spaced.append(replacement == " ")
+            self.close_rows.append(close_row)
+            self.close_cols.append(close_col)
+            self.open_indexes.append(open_idx)
+            self.close_indexes.append(close_idx)
+            self.kinds.append(kind)
+            self.depths.append(depth)
+            self.child_counts.append(child_count)
+            open_numbers.append(open_number)
+            parent_open_numbers.append(parent_open_number)
+        # a pair is numbered when it's opened, but only gets its index when
+        # it's closed
+        self.open_order.extend(range(len(self)))
+        for idx, open_number in enumerate(open_numbers):
+            self.open_order[open_number] = idx
+        self.parents = array("i", [
+            -1 if number < 0 else self.open_order[number]
+            for number in parent_open_numbers
+        ])
+
+    def _match_with_numpy(
+        self,
+        tokens: t.Sequence[tokenize.TokenInfo],
+        token_table: TokenTable | None,
+    ) -> bool:
+        # Same result as `_scan`, without a Python loop over all tokens:
+        # With open brackets as +1 and closing brackets as -1, the cumulative
+        # sum is the depth after each bracket. Within one depth, the brackets
+        # alternate between opening and closing, and each open bracket is
+        # matched by the next closing one => a stable sort by depth puts the
+        # pairs next to each other.
+        # Returns False (nothing done) if the brackets don't match up; the
+        # scan deals with that.
+        np = _numpy()
+        if token_table is None:
+            token_table = TokenTable(tokens)
+        ops = np.flatnonzero(
+            np.frombuffer(token_table.types, np.uint8) == tokenize.OP
+        )
+        codes = np.array(
+            [_BRACKET_CODES.get(tokens[idx][1], 0) for idx in ops.tolist()],
+            np.int8,
+        )
+        brackets = ops[codes != 0]
+        codes = codes[codes != 0]
+        if not len(brackets):
+            self._scan(())
+            return True
+        opening = codes > 0
+        depths = np.cumsum(np.where(opening, 1, -1))
+        if depths.min() < 0 or depths[-1] != 0:
+            return False
+        # the number of enclosing pairs
+        levels = depths - opening
+        by_level = np.argsort(levels, kind="stable")
+        opens, closes = by_level[0::2], by_level[1::2]
+        if (codes[opens] != -codes[closes]).any():
+            return False
+        # in the order they are closed (`by_level` numbers the brackets)
+        close_order = np.argsort(closes)
+        opens, closes = opens[close_order], closes[close_order]
+        count = len(opens)
+        pairs = np.arange(count)
+
+        # the parent of a pair is the last pair opened one level up before it
+        open_keys = levels[opens].astype(np.int64) * len(codes) + opens
+        open_keys_order = np.argsort(open_keys)
+        parent_keys = open_keys - len(codes)
+        parents = open_keys_order[
+            np.searchsorted(open_keys[open_keys_order], parent_keys) - 1
+        ]
+        parents[levels[opens] == 0] = -1
+        child_counts = np.bincount(parents[parents >= 0], minlength=count)
+
+        open_indexes = brackets[opens]
+        close_indexes = brackets[closes]
+        start_rows = np.frombuffer(token_table.start_rows, np.intc)
+        start_cols = np.frombuffer(token_table.start_cols, np.intc)
+        end_rows = np.frombuffer(token_table.end_rows, np.intc)
+        end_cols = np.frombuffer(token_table.end_cols, np.intc)
+        # see `_scan_parens`
+        first_in_line = np.ones(count, bool)
+        after_first = open_indexes > 0
+        first_in_line[after_first] = (
+            end_rows[open_indexes[after_first] - 1]
+            != start_rows[open_indexes[after_first]]
+        )
+        next_in_line = (
+            start_rows[open_indexes + 1] == end_rows[open_indexes]
+        )
+        open_end_cols = np.where(
+            first_in_line, start_cols[open_indexes + 1],
+            end_cols[open_indexes]
+        )
+        alone = pairs[first_in_line & ~next_in_line]
+        if len(alone):
+            # there is only this opening parenthesis on this line
+            open_end_cols[alone] = [
+                len(tokens[idx].line) - 2
+                for idx in open_indexes[alone].tolist()
+            ]
+
+        def column(
+            values: t.Any, typecode: str = "i", dtype: t.Any = np.intc
+        ) -> array[int]:
+            return array(typecode, values.astype(dtype).tobytes())
+
+        self.open_rows = column(start_rows[open_indexes])
+        self.open_cols = column(start_cols[open_indexes])
+        self.open_end_cols = column(open_end_cols)
+        self.spaced = column(~first_in_line, "B", np.uint8)
+        self.close_rows = column(start_rows[close_indexes])
+        self.close_cols = column(start_cols[close_indexes])
+        self.open_indexes = column(open_indexes)
+        self.close_indexes = column(close_indexes)
+        self.kinds = column(codes[opens] - 1, "B", np.uint8)
+        self.depths = column(levels[opens])
+        self.child_counts = column(child_counts)
+        self.open_order = column(np.argsort(opens))
+        self.parents = column(parents)
+        return True
+
+    def __len__(self) -> int:
+        return len(self.open_indexes)
+
+    @t.overload
+    def __getitem__(self, idx: int) -> ParensCords:
+        ...
+
+    @t.overload
+    def __getitem__(self, idx: slice) -> list[ParensCords]:
+        ...
+
+    def __getitem__(
+        self, idx: int | slice
+    ) -> ParensCords | list[ParensCords]:
+        if isinstance(idx, slice):
+            return [self[i] for i in range(len(self))[idx]]
+        return ParensCords(
+            (self.open_rows[idx], self.open_cols[idx]),
+            self.open_end_cols[idx],
+            " " if self.spaced[idx] else "",
+            (self.close_rows[idx], self.close_cols[idx]),
+            (self.open_indexes[idx], self.close_indexes[idx]),
+        )
+
+    def __iter__(self) -> t.Iterator[ParensCords]:
+        columns = zip(
+            self.open_rows, self.open_cols, self.open_end_cols, self.spaced,
+            self.close_rows, self.close_cols, self.open_indexes,
+            self.close_indexes
+        )
+        for (
+            open_row, open_col, open_end_col, spaced, close_row, close_col,
+            open_idx, close_idx
+        ) in columns:
+            yield ParensCords(
+                (open_row, open_col), open_end_col, " " if spaced else "",
+                (close_row, close_col), (open_idx, close_idx),
+            )
+
+
+def classify_parens(
+    tokens: t.Sequence[tokenize.TokenInfo],
+    parens_coords: t.Iterable[ParensCords],
+) -> list[str]:
+    # Labels each pair by looking at the tokens before it:
+    #  * CALL: `foo(...)`, `foo()(...)`, `"".join(...)`, ...
+    #  * DEFINITION: `def foo(...)`, `class Foo(...)`, `def foo[T](...)`
+    #  * SUBSCRIPT: `foo[...]`
+    #  * DISPLAY: `[...]`, `{...}`
+    #  * GROUPING: `(a + b)`, `(a, b)`, `()`, ...
+    #  * GENERATOR: `(a for a in b)`
+    kinds: dict[int, str] = {}
+    # the open token indexes and kinds of the enclosing pairs
+    stack: list[tuple[int, str]] = []
+    last_closed_kind = None
+    prev_token = prev_prev_token = None
+    for idx, token in enumerate(tokens):
+        if token.type in (tokenize.NL, tokenize.COMMENT):
+            continue
+        if token.type == tokenize.OP and token.string in OPEN_LIST:
+            call_like = prev_token is not None and is_call_like(
+                prev_token, prev_prev_token
+            )
+            if token.string == "{":
+                kind = DISPLAY
+            elif not call_like:
+                # taken as a statement if it could be either
+                kind = DISPLAY if token.string == "[" else GROUPING
+            elif (
+                prev_token is not None
+                and prev_token.type == tokenize.NAME
+                and prev_prev_token is not None
+                and prev_prev_token.string in ("def", "class")
+            ):
+                kind = DEFINITION
+            elif (
+                # after type parameters
+                token.string == "(" and last_closed_kind == DEFINITION
+                and prev_token is not None and prev_token.string == "]"
+            ):
+                kind = DEFINITION
+            else:
+                kind = SUBSCRIPT if token.string == "[" else CALL
+            kinds[idx] = kind
+            stack.append((idx, kind))
+        elif token.type == tokenize.OP and token.string in CLOSE_LIST:
+            if stack:
+                last_closed_kind = stack.pop()[1]
+        elif (
+            token.type == tokenize.NAME
+            and token.string == "for"
+            and stack
+            and stack[-1][1] == GROUPING
+        ):
+            kinds[stack[-1][0]] = GENERATOR
+            stack[-1] = (stack[-1][0], GENERATOR)
+        prev_prev_token = prev_token
+        prev_token = token
+    return [kinds[parens_coord.token_indexes[0]]
+            for parens_coord in parens_coords]
+
+
+# names that can be followed by an opening parenthesis without that
+# parenthesis being part of a call, definition, or class bases
+SOFT_KEYWORDS = {"match", "case", "type"}
+CALLABLE_KEYWORDS = {"None", "True", "False"}
+
+
+def is_call_like(
+    token: tokenize.TokenInfo, prev_token: tokenize.TokenInfo | None
+) -> bool | None:
+    # Whether an opening bracket after `token` (preceded by `prev_token`,
+    # skipping comments and `NL`s) calls or subscripts something; `None` if
+    # it can't be told from the tokens.
+    if token.type == tokenize.NAME:
+        if token.string in SOFT_KEYWORDS:
+            if token.string == "type" or not (
+                prev_token is None
+                or prev_token.type in (
+                    tokenize.NEWLINE, tokenize.INDENT, tokenize.DEDENT
                 )
+            ):
+                # a statement with one of them can't start with a bracket
+                return True
+            # `match (a):` is a statement, `match (a)` a call
+            return None
+        return (
+            not keyword.iskeyword(token.string)
+            or token.string in CALLABLE_KEYWORDS
+        )
+    if token.type == tokenize.OP:
+        return token.string in (")", "]", "}", "...")
+    return token.type in (tokenize.NUMBER, tokenize.STRING) or (
+        token.type == getattr(tokenize, "FSTRING_END", None)
+    )
+
 
-    return parentheses_pairs
+def split_lines(text: str, keepends: bool = False) -> list[str]:
+    # like `str.splitlines`, but only splits on "\n" like the tokenizer (and
+    # flake8) does, so the line numbers agree with the tokens'
+    lines = text.split("\n")
+    last_line = lines.pop()
+    if keepends:
+        lines = [line + "\n" for line in lines]
+    if last_line:
+        lines.append(last_line)
+    return lines
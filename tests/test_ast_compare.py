@@ -0,0 +1,76 @@
+# Copyright Rouven Bauer
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import ast
+
+import pytest
+
+from flake8_picky_parentheses import _ast_compare
+from flake8_picky_parentheses._ast_compare import (
+    ast_equal,
+    AstFingerprint,
+)
+
+
+@pytest.fixture(params=(True, False))
+def native_compare(request, monkeypatch):
+    if request.param:
+        if _ast_compare._ast_compare is None:
+            pytest.skip("ast.compare not available")
+    else:
+        monkeypatch.setattr(_ast_compare, "_ast_compare", None)
+    return request.param
+
+
+@pytest.mark.parametrize(("a", "b"), (
+    ("a = 1", "a = 1"),
+    ("a = (1)", "a =  1 "),
+    ("a = 1", "a = 2"),
+    ("a = 1", "a = 1.0"),
+    ("a = 1", "a = True"),
+    ("a = 'x'", "a = b'x'"),
+    ("a = 'x'", "a = u'x'"),
+    ("a = b", "b = a"),
+    ("a, b = c", "(a, b) = c"),
+    ("a, b = c", "[a, b] = c"),
+    ("foo(a, b)", "foo(a)"),
+    ("foo(a)", "foo(a, b)"),
+    ("foo(a)(b)", "foo(a, b)"),
+    ("foo(*a)", "foo(a)"),
+    ("x = a + b * c", "x = (a + b) * c"),
+    ("x = a if b else c", "x = a if b else  c"),
+    ("del a", "a"),
+    ("def f(a, b=1): pass", "def f(a, b=1):\n    pass"),
+    ("def f(a, b=1): pass", "def f(a=1, b=1): pass"),
+    ("x = None", "x = ..."),
+    ("", ""),
+    ("", "a"),
+))
+def test_ast_equal_matches_dump(a, b, native_compare):
+    tree_a = ast.parse(a)
+    tree_b = ast.parse(b)
+    expected = ast.dump(tree_a) == ast.dump(tree_b)
+    assert ast_equal(tree_a, tree_b) is expected
+    assert ast_equal(tree_b, tree_a) is expected
+    assert AstFingerprint(tree_a).matches(tree_b) is expected
+    assert AstFingerprint(tree_b).matches(tree_a) is expected
+
+
+def test_fingerprint_is_reusable(native_compare):
+    baseline = AstFingerprint(ast.parse("x = (a + b) * c"))
+    assert not baseline.matches(ast.parse("x =  a + b  * c"))
+    assert baseline.matches(ast.parse("x = (a + b) * c"))
+    assert not baseline.matches(ast.parse("x = (a + b) * c + d"))
+    assert not baseline.matches(ast.parse("x = (a + b)"))
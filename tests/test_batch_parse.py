@@ -0,0 +1,65 @@
+# Copyright Rouven Bauer
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import ast
+import sys
+
+import pytest
+
+from flake8_picky_parentheses import _batch_parse
+from flake8_picky_parentheses._batch_parse import parse_batch
+
+SOURCES = (
+    "a = (1)",
+    "",
+    "def f(\n    a,\n):\n    return a",
+    "if True:\n   pass\nelse:\n    pass",
+    "@foo\ndef f():\n    pass",
+    "match _:\n    case (1):\n        pass",
+    "x = 1; y = 2",
+    "x = '''\n'''",
+    "x = 'ä' + \\\n    b",
+    "x = 1\r\ny = 2",
+)
+
+
+def _positions(tree):
+    # relative to the first statement: the batch shifts all of them
+    line_offset = tree.body[0].lineno - 1 if tree.body else 0
+    return [
+        (node.lineno - line_offset, node.col_offset)
+        for node in ast.walk(tree)
+        if hasattr(node, "lineno")
+    ]
+
+
+@pytest.mark.parametrize("batch_size", (1, 3, 16))
+def test_parse_batch_matches_parse(batch_size, monkeypatch):
+    monkeypatch.setattr(_batch_parse, "BATCH_SIZE", batch_size)
+    sources = [
+        source for source in SOURCES
+        if not source.startswith("match") or sys.version_info >= (3, 10)
+    ]
+    parsed_sources = list(parse_batch(sources))
+    assert len(parsed_sources) == len(sources)
+    for source, tree in zip(sources, parsed_sources):
+        expected = ast.parse(source)
+        assert ast.dump(tree) == ast.dump(expected)
+        assert _positions(tree) == _positions(expected)
+
+
+def test_parse_batch_isolates_syntax_errors():
+    with pytest.raises(SyntaxError):
+        list(parse_batch(["a = 1", "b = (", "c = 2"]))
@@ -13,13 +13,17 @@
 # limitations under the License.
 
 
+from argparse import Namespace
+import itertools
 from pathlib import Path
 import tokenize
 from typing import List
 
+from flake8 import style_guide
 import pytest
 
 from flake8_picky_parentheses import PluginBracketsPosition
+from flake8_picky_parentheses._util import find_parens_coords
 
 from ._common import (
     lint_codes,
@@ -126,6 +130,39 @@ a == b
     assert lint_codes(plugin(s), ["PAR104"])
 
 
+# BAD (only the line of the closing bracket matters)
+def test_operand_after_closing_bracket_before_compound_statement(plugin):
+    s = """a = func(
+    1, 2, 3, 4, 5
+) + 6
+if a:
+    pass
+"""
+    assert lint_codes(plugin(s), ["PAR104"])
+
+
+# GOOD (keyword that ends the header of a compound statement)
+@pytest.mark.parametrize("s", (
+    """with open(
+    path
+) as f:
+    pass
+""",
+    """def foo(
+    a
+) -> int:
+    pass
+""",
+    """with open(
+    path
+) as f:  # comment
+    pass
+""",
+))
+def test_keyword_after_closing_bracket_in_header(plugin, s):
+    assert no_lint(plugin(s))
+
+
 # BAD (use parentheses in both case of line continuation)
 def test_parentheses_in_if_with_trailing_tab_only_with_first_new_line(plugin):
     s = """if (\t\t
@@ -822,6 +859,100 @@ def test_empty(plugin):
     assert no_lint(plugin(s))
 
 
+def _consecutive_brackets(count):
+    # `count` nested brackets, the opening/closing ones in one line each or
+    # broken up into several lines in all possible ways
+    breaks = list(itertools.product(("", "\n"), repeat=count - 1))
+    for open_breaks, close_breaks in itertools.product(breaks, breaks):
+        opening = "".join(
+            "([{"[idx % 3] + sep
+            for idx, sep in enumerate((*open_breaks, "\n"))
+        )
+        closing = "".join(
+            sep + ")]}"[idx % 3]
+            for idx, sep in reversed(list(enumerate(("\n", *close_breaks))))
+        )
+        yield f"x = {opening}    1{closing}\n"
+
+
+def _par103_reference(s):
+    # the former check: compare with all pairs opened before
+    lines = s.splitlines(keepends=True)
+    line_iter = iter(lines)
+    tokens = list(tokenize.generate_tokens(lambda: next(line_iter)))
+    pairs = sorted(find_parens_coords(tokens),
+                   key=lambda pair: pair.token_indexes[0])
+    problems = []
+    for idx, pair in enumerate(pairs):
+        (open_idx, close_idx), close = pair.token_indexes, pair.close
+        if (
+            pair.open_[0] == close[0]
+            or tokens[open_idx + 1].type not in (tokenize.COMMENT,
+                                                 tokenize.NL,
+                                                 tokenize.NEWLINE)
+            or lines[close[0] - 1][:close[1]].strip(" \t")
+        ):
+            continue
+        for offset, prev_pair in enumerate(reversed(pairs[:idx]), 1):
+            prev_open_idx, prev_close_idx = prev_pair.token_indexes
+            if (prev_open_idx == open_idx - offset
+                    and prev_close_idx != close_idx + offset):
+                problems.append(
+                    f"{pair.open_[0]}:{pair.open_[1] + 1} PAR103"
+                )
+    return sorted(problems)
+
+
+@pytest.mark.parametrize(
+    "s", [s for count in range(1, 5) for s in _consecutive_brackets(count)]
+)
+def test_consecutive_brackets_like_before(plugin, s):
+    problems = sorted(problem[:problem.index(":", problem.index(" "))]
+                      for problem in plugin(s) if " PAR103:" in problem)
+    assert problems == _par103_reference(s)
+
+
+def test_many_consecutive_brackets(plugin):
+    s = "x = " + "[" * 50 + "\n    1\n" + "]" * 49 + "\n]\n"
+    # all but the outermost one are closed consecutively
+    assert lint_codes(plugin(s), ["PAR103"])
+    s = "x = " + "[" * 50 + "\n    1\n" + "]\n" * 50
+    assert lint_codes(plugin(s), ["PAR103"] * 49)
+
+
+@pytest.mark.parametrize(("selected", "codes"), (
+    ({"PAR101", "PAR102", "PAR103", "PAR104"}, ["PAR101", "PAR104"]),
+    ({"PAR101"}, ["PAR101"]),
+    ({"PAR104"}, ["PAR104"]),
+    (set(), []),
+))
+def test_only_enabled_rules_are_checked(plugin, monkeypatch, selected, codes):
+    class DecisionEngine:
+        def __init__(self, options):
+            pass
+
+        def make_decision(self, code):
+            if code in selected:
+                return style_guide.Decision.Selected
+            return style_guide.Decision.Ignored
+
+    monkeypatch.setattr(style_guide, "DecisionEngine", DecisionEngine)
+    # restored after the test
+    monkeypatch.setattr(PluginBracketsPosition, "_enabled_codes",
+                        PluginBracketsPosition._enabled_codes)
+    monkeypatch.setattr(PluginBracketsPosition, "_result_cache", None)
+    options = Namespace(picky_parentheses_cache_dir=None)
+    PluginBracketsPosition.parse_options(None, options, [])
+    assert PluginBracketsPosition._enabled_codes == selected
+    s = """a = (
+    1)
+b = func(
+    1
+) + 6
+"""
+    assert lint_codes(plugin(s), codes)
+
+
 @pytest.mark.parametrize(
     "path",
     tuple(
@@ -0,0 +1,70 @@
+# Copyright Rouven Bauer
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import ast
+import tokenize
+
+from flake8_picky_parentheses import (
+    _file_context,
+    PluginBracketsPosition,
+    PluginRedundantParentheses,
+)
+from flake8_picky_parentheses._file_context import FileContext
+from flake8_picky_parentheses._util import ParensTable
+
+SOURCE = """a = (1)
+foo = [
+    1]
+
+if (b):
+    c = '''
+    (
+    '''
+"""
+
+
+def _file_tokens(lines):
+    line_iter = iter(lines)
+    return list(tokenize.generate_tokens(lambda: next(line_iter)))
+
+
+def test_plugins_share_the_context(monkeypatch):
+    lines = SOURCE.splitlines(keepends=True)
+    file_tokens = _file_tokens(lines)
+    scanned_tokens = []
+
+    class ParensTable_(ParensTable):
+        def __init__(self, tokens, *args):
+            scanned_tokens.append(len(tokens))
+            super().__init__(tokens, *args)
+
+    monkeypatch.setattr(_file_context, "ParensTable", ParensTable_)
+    par1 = PluginBracketsPosition(None, lambda: lines, file_tokens)
+    par0 = PluginRedundantParentheses(ast.parse(SOURCE), file_tokens, lines)
+    assert par0.context is par1.context
+    assert par0.file_tokens is file_tokens
+    assert [problem[:3] for problem in par1.run()]
+    assert [problem[:3] for problem in par0.run()]
+    # the whole file, only once
+    assert scanned_tokens == [len(file_tokens)]
+
+
+def test_other_tokens_get_another_context():
+    lines = SOURCE.splitlines(keepends=True)
+    context = FileContext.of(_file_tokens(lines))
+    other_context = FileContext.of(_file_tokens(lines))
+    assert other_context is not context
+    assert other_context.tokens == context.tokens
+    assert FileContext.of(other_context.tokens) is other_context
@@ -0,0 +1,66 @@
+# Copyright Rouven Bauer
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import ast
+import sys
+
+import pytest
+
+from flake8_picky_parentheses._line_index import index_logical_lines
+
+pytestmark = pytest.mark.skipif(
+    sys.version_info < (3, 8), reason="Python 3.8+ only"
+)
+
+SOURCE = """\
+@decorator(a)
+def foo(
+    b=(1),
+):
+    x = (c  # comment
+         + d)
+    if e: f()
+    elif (g):
+        pass
+    else:
+        pass
+    try:
+        pass
+    except (A, B):
+        pass
+"""
+
+
+def test_index_logical_lines():
+    tree = ast.parse(SOURCE)
+    line_ranges = ((1, 1), (2, 4), (5, 6), (7, 7), (8, 8), (10, 10), (14, 14))
+    nodes_by_line = index_logical_lines(tree, line_ranges)
+    foo = tree.body[0]
+    assign, if_, try_ = foo.body
+    expected = (
+        [(foo, "decorator_list", foo.decorator_list[0])],
+        [(foo.args, "args", foo.args.args[0]),
+         (foo.args, "defaults", foo.args.defaults[0])],
+        [(foo, "body", assign)],
+        [(if_, "test", if_.test), (if_, "body", if_.body[0])],
+        [(if_.orelse[0], "test", if_.orelse[0].test)],
+        [],
+        [(try_.handlers[0], "type", try_.handlers[0].type)],
+    )
+    assert len(nodes_by_line) == len(expected)
+    for nodes, expected_nodes in zip(nodes_by_line, expected):
+        actual_nodes = [(node.parent, node.field, node.node) for node in nodes]
+        assert sorted(actual_nodes, key=lambda node: node[1]) \
+            == sorted(expected_nodes, key=lambda node: node[1])
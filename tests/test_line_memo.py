@@ -0,0 +1,116 @@
+# Copyright Rouven Bauer
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+from contextlib import closing
+import os
+import sqlite3
+
+import pytest
+
+from flake8_picky_parentheses._line_memo import (
+    LineMemo,
+    LineStore,
+)
+
+
+def test_line_memo_counts_hits_and_misses():
+    line_memo = LineMemo()
+    assert line_memo.get("a = (1)") is None
+    line_memo.put("a = (1)", ((1, 4),))
+    assert line_memo.get("a = (1)") == ((1, 4),)
+    line_memo.put("foo(a)", ())
+    assert line_memo.get("foo(a)") == ()
+    assert (line_memo.hits, line_memo.misses) == (2, 1)
+
+
+def test_line_memo_evicts_least_recently_used():
+    line_memo = LineMemo(2)
+    line_memo.put("a", ())
+    line_memo.put("b", ())
+    line_memo.get("a")
+    line_memo.put("c", ())
+    assert line_memo.get("b") is None
+    assert line_memo.get("a") == ()
+    assert line_memo.get("c") == ()
+    line_memo.resize(1)
+    assert line_memo.get("a") is None
+    assert line_memo.get("c") == ()
+
+
+def test_line_memo_can_be_turned_off():
+    line_memo = LineMemo(0)
+    line_memo.put("a", ())
+    assert line_memo.get("a") is None
+    assert (line_memo.hits, line_memo.misses) == (0, 0)
+    line_memo.resize(1)
+    line_memo.put("a", ())
+    assert line_memo.get("a") == ()
+
+
+@pytest.fixture
+def line_store(tmp_path):
+    line_stores = []
+
+    def open_(name="lines.sqlite"):
+        line_stores.append(LineStore(str(tmp_path / name)))
+        return line_stores[-1]
+
+    yield open_
+    for line_store_ in line_stores:
+        line_store_.close()
+
+
+def test_line_store_persists_flushed_lines(line_store):
+    line_memo = LineMemo(store=line_store())
+    line_memo.put("a = (1)", ((1, 4),))
+    line_memo.put("foo(a)", ())
+    # nothing is written before the file is done
+    assert LineMemo(store=line_store()).get("a = (1)") is None
+    line_memo.flush()
+    line_memo = LineMemo(0, store=line_store())
+    assert line_memo.get("a = (1)") == ((1, 4),)
+    assert line_memo.get("foo(a)") == ()
+    assert line_memo.get("foo(b)") is None
+    assert (line_memo.hits, line_memo.misses) == (2, 1)
+    assert line_memo.hit_rate == 2 / 3
+
+
+def test_line_store_compact(line_store, monkeypatch):
+    line_store_ = line_store()
+    monkeypatch.setattr(LineStore, "_today", staticmethod(lambda: 100))
+    line_store_.put("old", ())
+    line_store_.flush()
+    monkeypatch.setattr(LineStore, "_today", staticmethod(lambda: 110))
+    for i in range(2000):
+        line_store_.put(f"new{i}", ((1, i),))
+    line_store_.flush()
+    line_store_.compact(5 * 24 * 60 * 60, 10 ** 9)
+    assert line_store_.get("old") is None
+    assert line_store_.get("new0") == ((1, 0),)
+    line_store_.compact(5 * 24 * 60 * 60, 16 * 1024)
+    assert 0 < os.path.getsize(line_store_.path) <= 16 * 1024
+    with closing(sqlite3.connect(line_store_.path)) as connection:
+        row_count, = connection.execute(
+            "SELECT COUNT(*) FROM lines"
+        ).fetchone()
+    assert 0 < row_count < 2000
+
+
+def test_broken_line_store_is_ignored(line_store, tmp_path):
+    (tmp_path / "broken.sqlite").write_text("not a database")
+    line_memo = LineMemo(store=line_store("broken.sqlite"))
+    line_memo.put("a", ())
+    line_memo.flush()
+    assert line_memo.get("b") is None
@@ -0,0 +1,73 @@
+# Copyright Rouven Bauer
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import tokenize
+
+import pytest
+
+from flake8_picky_parentheses._line_table import LineTable
+from flake8_picky_parentheses._token_table import TokenTable
+
+SOURCE = """a = (1)
+foo = [
+    1]
+
+if (b):
+\tc = '''
+    (
+    ''' + f(
+\t    d)
+"""
+
+
+@pytest.fixture
+def lines():
+    return SOURCE.splitlines(keepends=True)
+
+
+@pytest.fixture
+def tokens(lines):
+    line_iter = iter(lines)
+    return list(tokenize.generate_tokens(lambda: next(line_iter)))
+
+
+@pytest.mark.parametrize("rows", (range(12), reversed(range(12)), (3, 1, 9)))
+def test_first_token(lines, tokens, rows):
+    line_table = LineTable(TokenTable(tokens), lines)
+    for row in rows:
+        expected = next(
+            (idx for idx, token in enumerate(tokens) if token.start[0] >= row),
+            len(tokens),
+        )
+        assert line_table.first_token(row) == expected
+
+
+@pytest.mark.parametrize(("row", "indentation"), (
+    (1, 0), (2, 0), (3, 4), (5, 0), (6, 1), (8, 8), (9, 5),
+))
+def test_indentation(lines, tokens, row, indentation):
+    line_table = LineTable(TokenTable(tokens), lines)
+    assert line_table.indentation(row) == indentation
+
+
+def test_first_in_line(lines, tokens):
+    line_table = LineTable(TokenTable(tokens), lines)
+    for token in tokens:
+        row, col = token.start
+        if row > len(lines):
+            continue
+        assert line_table.first_in_line(row, col) == all(
+            char in " \t" for char in lines[row - 1][:col]
+        )
@@ -0,0 +1,120 @@
+# Copyright Rouven Bauer
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import ast
+import sys
+
+import pytest
+
+from flake8_picky_parentheses._node_table import NodeTable
+
+SOURCES = (
+    "a = (1)",
+    "@foo\ndef f(a=(1), *, b=c):\n    return [x for x in (y) if (z)]",
+    "x = {a: (b), **c}\nfoo(*a, b=(c), **d)",
+    "x = a if (b) else c\ny = a[1:(2), ::3]",
+    "class A(B, metaclass=C):\n    x: int = (1)",
+    "with (a) as b, c:\n    pass",
+    "try:\n    pass\nexcept (A, B) as e:\n    pass",
+    "x = f'{a}{(b)!r:>{c}}'",
+    "async def f():\n    await (a)\n    async for x in (y):\n        pass",
+    "(a, b), c = d\nx = (\n    a,\n    b,\n)",
+)
+
+
+def _reference_nodes(node, parents=()):
+    # what the table replaced: a recursive walk, sorted afterwards
+    pos = None
+    if hasattr(node, "lineno") and hasattr(node, "col_offset"):
+        pos = node.lineno, node.col_offset
+    end = (0, 0) if pos is None else pos
+    for child in ast.iter_child_nodes(node):
+        for child_row in _reference_nodes(child, (node, *parents)):
+            yield child_row
+            end = max(end, child_row[2])
+    if pos is not None:
+        if (
+            hasattr(node, "end_lineno")
+            and hasattr(node, "end_col_offset")
+        ):
+            end = node.end_lineno, node.end_col_offset
+        yield node, pos, end, parents
+
+
+@pytest.mark.parametrize("source", SOURCES)
+def test_node_table_matches_recursive_walk(source):
+    tree = ast.parse(source)
+    expected = sorted(_reference_nodes(tree), key=lambda x: (x[1], len(x[3])))
+    node_table = NodeTable(tree)
+    assert node_table.size == len(expected)
+    for row, (node, pos, end, parents) in enumerate(expected):
+        assert node_table.nodes[row] is node
+        assert node_table.starts[row] == pos
+        assert node_table.ends[row] == end
+        assert node_table.depths[row] == len(parents)
+        assert node_table.parent(row) is parents[0]
+    assert node_table.parent(node_table.nodes.index(tree)) is None
+
+
+def test_node_table_handles_deep_nesting():
+    source = "x = a" + " + a" * 3000
+    try:
+        tree = ast.parse(source)
+    except RecursionError:
+        pytest.skip(f"Python {sys.version_info[:2]} can't parse it either")
+    node_table = NodeTable(tree)
+    # Assign, x, 3000 BinOps, 3001 a's
+    assert node_table.size == 6003
+    assert max(node_table.depths[:node_table.size]) == 3002
+
+
+@pytest.mark.parametrize("source", SOURCES)
+def test_node_table_queries_match_scan(source):
+    tree = ast.parse(source)
+    node_table = NodeTable(tree)
+    rows = range(node_table.size)
+    spans = {(node_table.starts[row], node_table.ends[row]) for row in rows}
+    for start, end in spans:
+        assert list(node_table.enclosed(start, end)) == [
+            row for row in rows
+            if start <= node_table.starts[row]
+            and node_table.ends[row] <= end
+        ]
+        assert list(node_table.starting_at(start)) == [
+            row for row in rows if node_table.starts[row] == start
+        ]
+
+
+def test_node_table_queries_visit_few_nodes():
+    source = "x = (a + b) * c\n" * 1000 + "y = [(d)]\n"
+    node_table = NodeTable(ast.parse(source))
+    # the nodes in the parentheses of the last line: `d`
+    row = next(node_table.enclosed((1001, 5), (1001, 8)))
+    assert node_table.nodes[row].id == "d"
+    # `d`, the only node starting in the span
+    assert node_table.visits == 1
+    node_table.visits = 0
+    # `(a + b)` on line 500: the product starting at the parenthesis, too,
+    # then the sum
+    row = next(node_table.enclosed((500, 4), (500, 11)))
+    assert isinstance(node_table.nodes[row].op, ast.Add)
+    assert node_table.visits == 2
+    node_table.visits = 0
+    # the sum, `a`, and `b`
+    assert len(list(node_table.enclosed((500, 4), (500, 11)))) == 3
+    assert node_table.visits == 4
+    node_table.visits = 0
+    assert len(node_table.starting_at((1001, 0))) == 2
+    assert node_table.visits == 2
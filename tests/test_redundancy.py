@@ -0,0 +1,203 @@
+# Copyright Rouven Bauer
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import ast
+import sys
+
+import pytest
+
+from flake8_picky_parentheses._ast_compare import AstFingerprint
+from flake8_picky_parentheses._redundancy import RedundancyEngine
+from flake8_picky_parentheses._redundant_parentheses import (
+    LogicalLine,
+    PluginRedundantParentheses,
+)
+from flake8_picky_parentheses._util import find_parens_coords
+
+pytestmark = pytest.mark.skipif(
+    not RedundancyEngine.supported, reason="Python 3.8+ only"
+)
+
+
+def _verdicts(s):
+    logical_line = LogicalLine(s, 0)
+    tree = ast.parse(s)
+    engine = RedundancyEngine(tree, logical_line.tokens, s)
+    for parens_coord in find_parens_coords(logical_line.tokens):
+        reparse_verdict = PluginRedundantParentheses._parens_check_optional(
+            logical_line, AstFingerprint(tree), parens_coord
+        )
+        yield engine.parens_redundant(parens_coord), reparse_verdict
+
+
+AGREEMENT_CASES = (
+    "a = (1)",
+    "a = (b, c)",
+    "(a, b) = c",
+    "foo((a + b) * c)",
+    "foo(a + (b * c))",
+    "(a - b) + c",
+    "a - (b + c)",
+    "(a ** b) ** c",
+    "a ** (b ** c)",
+    "a ** (-b)",
+    "(-a) ** b",
+    "-(a ** b)",
+    "not (not a)",
+    "(a < b) < c",
+    "(a and b) and c",
+    "a or (b and c)",
+    "(a if b else c) if d else e",
+    "a if b else (c if d else e)",
+    "(a).b",
+    "(a + b).c",
+    "(1).real",
+    "(f)(x)",
+    "x[(a)]",
+    "x[(a):(b)]",
+    "x[(a, b)]",
+    "foo((x for x in y))",
+    "foo((x for x in y), z)",
+    "a = (x for x in y)",
+    "print((a))",
+    "print((a), b)",
+    "foo((a, b))",
+    "foo(a=(b), **(c))",
+    "foo(*(a or b))",
+    "x = (yield)",
+    "foo((yield))",
+    "x = (y := 1)",
+    "foo((y := 1))",
+    "(y := 1)",
+    "x = (y := 1, 2)",
+    "[(a) for (b) in (c) if (d)]",
+    "[(lambda: a) for b in c]",
+    "{(a): (b), **(c)}",
+    "x = (lambda: a)",
+    "(lambda: a)(b)",
+    "x = (())",
+    "x = ((a))",
+    "x = a | ((b | c))",
+    "x = (\n    a\n)",
+    "x = [(\n    a\n)]",
+    "x = ('a'\n     'b')",
+    "x = (a \\\n     + b)",
+    "x = ('ä') + (b)",
+    "class A(): pass",
+    "def f(): pass",
+    "if (a):\n    pass",
+    "for (a) in (b):\n    pass",
+    "return (a)",
+    "return (yield)",
+    "del (a)",
+    "assert (a), (b)",
+    "raise (a) from (b)",
+    "x: (int) = (1)",
+    "x += (1, 2)",
+    "with (a) as b:\n    pass",
+    "...(a)",
+    "x[a, (b):c]",
+    "x += (y := a), (b)",
+    "foo(x[(a), (b)])",
+    "foo(x[\n    (a),\n    b:c\n])",
+    "f(*(a), **(b))",
+    "x = [(\n    a\n), (b)]",
+    "(a).b = [(c)]",
+    "x = match ((a + b))",
+    "type ((a))",
+    "print(type (a))",
+    "a; case ((b))",
+    *(
+        () if sys.version_info < (3, 10) else (
+            "match (\n    (a + b)\n).c:\n    case 1:\n        pass",
+            "match (\n    (a + b)\n)[0]:\n    case 1:\n        pass",
+            "match (  # c\n    (a + b)).c:\n    case 1:\n        pass",
+            "match ((a + b)).c:\n    case 1:\n        pass",
+        )
+    ),
+)
+
+
+@pytest.mark.parametrize("s", AGREEMENT_CASES)
+def test_engine_agrees_with_reparse(s):
+    for verdict, reparse_verdict in _verdicts(s):
+        assert verdict is None or verdict == reparse_verdict
+
+
+@pytest.mark.parametrize("s", AGREEMENT_CASES)
+def test_segment_check_agrees_with_reparse(s):
+    logical_line = LogicalLine(s, 0)
+    tree = ast.parse(s)
+    engine = RedundancyEngine(tree, logical_line.tokens, s)
+    for parens_coord in find_parens_coords(logical_line.tokens):
+        verdict = PluginRedundantParentheses._parens_check_segment(
+            engine, parens_coord
+        )
+        reparse_verdict = PluginRedundantParentheses._parens_check_optional(
+            logical_line, AstFingerprint(tree), parens_coord
+        )
+        assert verdict is None or verdict == reparse_verdict
+
+
+@pytest.mark.parametrize("s", (
+    "a = (1)",
+    "foo((a + b) * c)",
+    "if (a and b) or c:\n    pass",
+    "return (a.b)[(c)]",
+    "x = [(a), {b: (c)}]",
+))
+def test_engine_classifies_common_shapes(s):
+    assert all(verdict is not None for verdict, _ in _verdicts(s))
+
+
+@pytest.mark.parametrize("s", AGREEMENT_CASES + (
+    "(a,\n b) = c",
+    "(\na, b\\\n) = 1, 2",
+    "x = (\n    a,\n    b,\n)",
+    "foo(\n    a,\n    b,\n)",
+    "x = (a  # comment\n)",
+    "(a): int = 1",
+    "try:\n    pass\nexcept (A, B):\n    pass",
+))
+def test_tokens_agree_with_reparse(s):
+    logical_line = LogicalLine(s, 0)
+    baseline = AstFingerprint(ast.parse(s))
+    engine = RedundancyEngine(None, logical_line.tokens, s)
+    for parens_coord in find_parens_coords(logical_line.tokens):
+        verdict = engine.parens_redundant_by_tokens(parens_coord)
+        reparse_verdict = PluginRedundantParentheses._parens_check_optional(
+            logical_line, baseline, parens_coord
+        )
+        assert verdict is None or verdict == reparse_verdict
+
+
+@pytest.mark.parametrize("s", (
+    "return (x)",
+    "a = (1)",
+    "if (cond):\n    pass",
+    "(name)",
+    "x = ('a' 'b')",
+    "x = (a.b.c)",
+    "x = (foo(a, b)[c].d)",
+    "foo(a, [b], {c})",
+    "x = (\n    a,\n    b,\n)",
+))
+def test_tokens_classify_trivial_shapes(s):
+    logical_line = LogicalLine(s, 0)
+    engine = RedundancyEngine(None, logical_line.tokens, s)
+    assert all(
+        engine.parens_redundant_by_tokens(parens_coord) is not None
+        for parens_coord in find_parens_coords(logical_line.tokens)
+    )
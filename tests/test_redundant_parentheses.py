@@ -27,7 +27,22 @@ from typing import (
 
 import pytest
 
-from flake8_picky_parentheses import PluginRedundantParentheses
+from flake8_picky_parentheses import (
+    _redundant_parentheses,
+    PluginRedundantParentheses,
+)
+from flake8_picky_parentheses._ast_compare import AstFingerprint
+from flake8_picky_parentheses._line_memo import (
+    LineMemo,
+    LineStore,
+)
+from flake8_picky_parentheses._node_table import NodeTable
+from flake8_picky_parentheses._redundancy import RedundancyEngine
+from flake8_picky_parentheses._redundant_parentheses import (
+    LOGICAL_LINE_STRIPPED_TYPES,
+    LogicalLine,
+)
+from flake8_picky_parentheses._util import find_parens_coords
 
 from ._common import (
     lint_codes,
@@ -37,6 +52,13 @@ from ._common import (
 T = TypeVar("T")
 
 
+@pytest.fixture(autouse=True)
+def no_line_memo(monkeypatch):
+    # each test checks its lines itself, not whatever an earlier test left
+    # in the (class level) memo; the memo tests turn it on themselves
+    monkeypatch.setattr(PluginRedundantParentheses, "_line_memo", LineMemo(0))
+
+
 @pytest.fixture
 def plugin():
     def run(s: str) -> List[str]:
@@ -1964,3 +1986,230 @@ def _():
         ...
 """
     assert no_lint(plugin(s))
+
+
+@pytest.mark.parametrize("s", (
+    "x = " + " + ".join(f"(a{i})" for i in range(20)),
+    "x = " + ", ".join(f"(a{i} + b) * c" for i in range(20)),
+    "x = (a) + (b + c) * d + (e) - (f - g) + ((h)) * (i)",
+    "foo((a), (b) * (c), d=(e))(f)",
+    "x = (\n    (a),\n    (b) + (c),\n)",
+))
+def test_group_check_matches_per_pair_check(s):
+    logical_line = LogicalLine(s, 0)
+    baseline = AstFingerprint(ast.parse(s))
+    parens_coords = find_parens_coords(logical_line.tokens)
+    expected = [
+        parens_coord for parens_coord in parens_coords
+        if PluginRedundantParentheses._parens_check_optional(
+            logical_line, baseline, parens_coord
+        )
+    ]
+    assert expected == list(PluginRedundantParentheses._find_redundant_parens(
+        logical_line, baseline, parens_coords
+    ))
+
+
+def test_group_check_parses_logarithmically(monkeypatch):
+    s = "x = " + " + ".join(f"(a{i})" for i in range(32))
+    logical_line = LogicalLine(s, 0)
+    baseline = AstFingerprint(ast.parse(s))
+    parens_coords = find_parens_coords(logical_line.tokens)
+    parse_calls = []
+    original_parse = ast.parse
+
+    def parse(*args, **kwargs):
+        parse_calls.append(args)
+        return original_parse(*args, **kwargs)
+
+    monkeypatch.setattr(ast, "parse", parse)
+    redundant = list(PluginRedundantParentheses._find_redundant_parens(
+        logical_line, baseline, parens_coords
+    ))
+    assert redundant == parens_coords
+    # group sizes 1, 2, 4, 8, 16, 1
+    assert len(parse_calls) == 6
+
+
+def test_trivial_lines_are_not_parsed():
+    s = """\
+a = (1)
+if (b):
+    foo(c, [d])
+x = (e + f) * g
+(
+h, i\\
+) = 1, 2
+"""
+    lines = s.splitlines(keepends=True)
+    line_iter = iter(lines)
+    file_tokens = list(tokenize.generate_tokens(lambda: next(line_iter)))
+    plugin_ = PluginRedundantParentheses(ast.parse(s), file_tokens, lines)
+    assert len(list(plugin_.run())) == 3
+    # `foo(c, [d])` has no grouping parentheses
+    assert plugin_.stats["lines_skipped"] == 1
+    # only the last statement needs the full re-parse check (and the one
+    # before it, if the file's AST can't be used)
+    parses_avoided = 3 if RedundancyEngine.supported else 2
+    assert plugin_.stats["parses_avoided"] == parses_avoided
+
+
+FILE_TOKENS_SOURCE = """\
+# comment
+@decorator((a))
+def foo(
+    a=(1),  # comment
+):
+    x = (a  # comment
+         + b)
+    if (a):
+        pass
+    elif (b):
+        pass
+    else:
+        y = [(\\
+            a)]
+    try:
+        pass
+    except (A):
+        pass
+"""
+
+
+def _logical_lines_from_file_tokens(s):
+    lines = s.splitlines(keepends=True)
+    line_iter = iter(lines)
+    file_tokens = list(tokenize.generate_tokens(lambda: next(line_iter)))
+    for logical_line in PluginRedundantParentheses._get_logical_lines(
+        lines, file_tokens
+    ):
+        yield PluginRedundantParentheses._strip_logical_line(logical_line)
+
+
+def test_logical_line_tokens_match_tokenized_line():
+    def significant(tokens):
+        return [
+            token[:4] for token in tokens
+            if token.type not in LOGICAL_LINE_STRIPPED_TYPES
+        ]
+
+    for logical_line in _logical_lines_from_file_tokens(FILE_TOKENS_SOURCE):
+        tokens = logical_line.tokens
+        # the tokens after the line's NEWLINE token are not needed
+        retokenized = LogicalLine(logical_line.line, 0).tokens[:len(tokens)]
+        assert significant(tokens) == significant(retokenized)
+        assert find_parens_coords(tokens) == find_parens_coords(retokenized)
+
+
+def test_file_is_tokenized_once(monkeypatch):
+    lines = FILE_TOKENS_SOURCE.splitlines(keepends=True)
+    line_iter = iter(lines)
+    file_tokens = list(tokenize.generate_tokens(lambda: next(line_iter)))
+    plugin_ = PluginRedundantParentheses(
+        ast.parse(FILE_TOKENS_SOURCE), file_tokens, lines
+    )
+
+    def generate_tokens(*args, **kwargs):
+        raise AssertionError("file must not be tokenized again")
+
+    monkeypatch.setattr(tokenize, "generate_tokens", generate_tokens)
+    assert len(list(plugin_.run())) == 6
+
+
+def test_line_memo_remembers_problems(plugin, monkeypatch):
+    line_memo = LineMemo()
+    monkeypatch.setattr(PluginRedundantParentheses, "_line_memo", line_memo)
+    s = """\
+x = (a) + b
+def foo():
+    x = (a) + b
+    if True:
+        x = (a) + b
+"""
+    assert plugin(s) == [
+        "1:5 PAR001: Redundant parentheses",
+        "3:9 PAR001: Redundant parentheses",
+        "5:13 PAR001: Redundant parentheses",
+    ]
+    # the lines of a file are checked together
+    assert (line_memo.hits, line_memo.misses) == (0, 3)
+    assert plugin(s) == [
+        "1:5 PAR001: Redundant parentheses",
+        "3:9 PAR001: Redundant parentheses",
+        "5:13 PAR001: Redundant parentheses",
+    ]
+    assert (line_memo.hits, line_memo.misses) == (3, 3)
+
+
+def test_line_store_only_checks_changed_lines(plugin, tmp_path, monkeypatch):
+    path = str(tmp_path / "lines.sqlite")
+    line_memo = LineMemo(store=LineStore(path))
+    monkeypatch.setattr(PluginRedundantParentheses, "_line_memo", line_memo)
+    s = """\
+a = (1)
+b = (c + d) * e
+foo((a, b))
+"""
+    assert len(plugin(s)) == 1
+    line_memo.store.close()
+    # a new process editing the file
+    line_memo = LineMemo(store=LineStore(path))
+    monkeypatch.setattr(PluginRedundantParentheses, "_line_memo", line_memo)
+    assert plugin(s.replace("(1)", "(2)")) == [
+        "1:5 PAR001: Redundant parentheses",
+    ]
+    assert (line_memo.hits, line_memo.misses) == (2, 1)
+    line_memo.store.close()
+
+
+@pytest.mark.skipif(sys.version_info < (3, 8),
+                    reason="no end positions in Python 3.7")
+@pytest.mark.parametrize(("problem_rows", "expected_rows"), (
+    ({1}, [(1, 1)]),
+    ({3}, [(3, 3)]),
+    ({5}, [(4, 5)]),
+    ({8}, [(7, 9)]),
+    ({9}, [(7, 9), (9, 9)]),
+    ({1, 8}, [(1, 1), (7, 9)]),
+    ({10}, [(10, 11)]),
+))
+def test_problem_statements(problem_rows, expected_rows):
+    s = """\
+a = (1)
+b = 2
+c = (3)
+@decorator
+def foo(x=(1)): pass
+# comment
+d = (
+    4
+); e = (5)
+f = (6,
+     7); g = 8
+"""
+    statements = PluginRedundantParentheses._problem_statements(
+        ast.parse(s), problem_rows
+    )
+    rows = [
+        (min([stmt.lineno] + [decorator.lineno for decorator
+                              in getattr(stmt, "decorator_list", ())]),
+         stmt.end_lineno)
+        for stmt in statements
+    ]
+    assert rows == expected_rows
+
+
+def test_only_statements_with_problems_are_looked_at(plugin, monkeypatch):
+    s = "x = foo(a, [b], {c: d})\n" * 500 + "y = (1)\n"
+    table_sizes = []
+
+    def node_table(tree):
+        table = NodeTable(tree)
+        table_sizes.append(table.size)
+        return table
+
+    monkeypatch.setattr(_redundant_parentheses, "NodeTable", node_table)
+    assert plugin(s) == ["501:5 PAR001: Redundant parentheses"]
+    if sys.version_info >= (3, 8):
+        # the nodes of `y = (1)`: Assign, Name, Constant
+        assert table_sizes == [3]
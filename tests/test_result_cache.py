@@ -0,0 +1,155 @@
+# Copyright Rouven Bauer
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import ast
+import os
+import time
+import tokenize
+
+import pytest
+
+from flake8_picky_parentheses import (
+    PluginBracketsPosition,
+    PluginRedundantParentheses,
+)
+from flake8_picky_parentheses._result_cache import ResultCache
+
+SOURCE = """a = (1)
+foo = [
+    1]
+"""
+
+
+def _file_tokens(lines):
+    line_iter = iter(lines)
+    return list(tokenize.generate_tokens(lambda: next(line_iter)))
+
+
+def _run_redundant_parentheses(lines):
+    plugin = PluginRedundantParentheses(ast.parse("".join(lines)),
+                                        _file_tokens(lines), lines)
+    return [problem[:3] for problem in plugin.run()]
+
+
+def _run_brackets_position(lines):
+    plugin = PluginBracketsPosition(None, lambda: lines, _file_tokens(lines))
+    return [problem[:3] for problem in plugin.run()]
+
+
+def _entries(directory):
+    return sorted(
+        os.path.join(root, name)
+        for root, _, names in os.walk(directory)
+        for name in names if name.endswith(".json")
+    )
+
+
+def test_put_and_get(tmp_path):
+    cache = ResultCache(str(tmp_path))
+    key = cache.key("plugin", ["PAR001"], ["a = (1)\n"])
+    assert cache.get(key) is None
+    cache.put(key, [(1, 4, "PAR001: Redundant parentheses")])
+    assert cache.get(key) == [(1, 4, "PAR001: Redundant parentheses")]
+    assert (cache.hits, cache.misses) == (1, 1)
+    assert not [name for name in os.listdir(tmp_path / key[:2])
+                if not name.endswith(".json")]
+
+
+@pytest.mark.parametrize(("plugin", "codes", "lines"), (
+    ("other", ["PAR001"], ["a = (1)\n"]),
+    ("plugin", ["PAR001", "PAR002"], ["a = (1)\n"]),
+    ("plugin", ["PAR001"], ["a = (2)\n"]),
+    ("plugin", ["PAR001"], ["a = (1)", "\n"]),
+))
+def test_key_depends_on_everything(plugin, codes, lines):
+    key = ResultCache.key("plugin", ["PAR001"], ["a = (1)\n"])
+    other_key = ResultCache.key(plugin, codes, lines)
+    if lines == ["a = (1)", "\n"]:
+        # only the content of the file matters
+        assert key == other_key
+    else:
+        assert key != other_key
+
+
+def test_broken_entries_are_misses(tmp_path):
+    cache = ResultCache(str(tmp_path))
+    key = cache.key("plugin", [], [])
+    cache.put(key, [])
+    with open(_entries(tmp_path)[0], "w") as fd:
+        fd.write('[[1, 2, "PAR001: Redundant')
+    assert cache.get(key) is None
+
+
+def test_entries_can_be_read_from_a_read_only_cache(tmp_path, monkeypatch):
+    cache = ResultCache(str(tmp_path))
+    key = cache.key("plugin", [], [])
+    cache.put(key, [(1, 4, "PAR001: Redundant parentheses")])
+
+    def utime(*args, **kwargs):
+        raise PermissionError(args[0])
+
+    monkeypatch.setattr(os, "utime", utime)
+    assert cache.get(key) == [(1, 4, "PAR001: Redundant parentheses")]
+    assert (cache.hits, cache.misses) == (1, 0)
+
+
+def test_compact_drops_old_entries(tmp_path):
+    cache = ResultCache(str(tmp_path), max_age=86400)
+    for i in range(3):
+        cache.put(cache.key("plugin", [], [str(i)]), [])
+    old_entry = _entries(tmp_path)[0]
+    two_days_ago = time.time() - 2 * 86400
+    os.utime(old_entry, (two_days_ago, two_days_ago))
+    cache.compact()
+    entries = _entries(tmp_path)
+    assert len(entries) == 2
+    assert old_entry not in entries
+
+
+def test_compact_drops_least_recently_used_entries(tmp_path):
+    # room for 2 entries (and the line store)
+    cache = ResultCache(str(tmp_path), max_size=3400)
+    keys = [cache.key("plugin", [], [str(i)]) for i in range(4)]
+    for i, key in enumerate(keys):
+        cache.put(key, [(1, 0, "x" * 1000)])
+        entry = cache._path(key)
+        os.utime(entry, (time.time() - 100 + i, time.time() - 100 + i))
+    cache.get(keys[0])
+    cache.compact()
+    assert _entries(tmp_path) == sorted(cache._path(key)
+                                        for key in (keys[0], keys[3]))
+
+
+@pytest.mark.parametrize("run", (
+    _run_redundant_parentheses, _run_brackets_position
+))
+def test_plugin_replays_cached_problems(run, tmp_path, monkeypatch):
+    lines = SOURCE.splitlines(keepends=True)
+    expected = run(lines)
+    assert expected
+    cache = ResultCache(str(tmp_path))
+    for plugin in (PluginRedundantParentheses, PluginBracketsPosition):
+        monkeypatch.setattr(plugin, "_result_cache", cache)
+    assert run(lines) == expected
+    assert (cache.hits, cache.misses) == (0, 1)
+
+    def fail(*args, **kwargs):
+        raise AssertionError("file checked again")
+
+    monkeypatch.setattr(PluginRedundantParentheses, "_check", fail)
+    monkeypatch.setattr(PluginBracketsPosition, "check_brackets_position",
+                        fail)
+    assert run(lines) == expected
+    assert (cache.hits, cache.misses) == (1, 1)
@@ -0,0 +1,72 @@
+# Copyright Rouven Bauer
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import tokenize
+
+import pytest
+
+from flake8_picky_parentheses._token_table import TokenTable
+
+SOURCE = """\
+def foo(a=(  # comment
+    1
+)):
+    return f"{a!r}" + '''
+    '''
+"""
+
+
+@pytest.fixture
+def tokens():
+    line_iter = iter(SOURCE.splitlines(keepends=True))
+    return list(tokenize.generate_tokens(lambda: next(line_iter)))
+
+
+def test_columns_match_tokens(tokens):
+    token_table = TokenTable(tokens)
+    assert len(token_table) == len(tokens)
+    for idx, token in enumerate(tokens):
+        assert token_table.types[idx] == token.type
+        assert token_table.start(idx) == token.start
+        assert (token_table.end_rows[idx], token_table.end_cols[idx]) \
+            == token.end
+        assert token_table.significant[idx] == (
+            token.type not in (tokenize.NL, tokenize.COMMENT)
+        )
+
+
+def test_significant_tokens(tokens):
+    token_table = TokenTable(tokens)
+    open_ = next(idx for idx, token in enumerate(tokens)
+                 if token.string == "(" and token.start == (1, 10))
+    one = next(idx for idx, token in enumerate(tokens)
+               if token.string == "1")
+    # the comment and the line break
+    assert token_table.all_insignificant(open_ + 1, one)
+    assert not token_table.all_insignificant(open_ + 1, one + 1)
+    assert token_table.all_insignificant(one, one)
+    assert token_table.next_significant(open_ + 1) == one
+    assert token_table.next_significant(one) == one
+
+
+def test_next_line_breaks(tokens):
+    token_table = TokenTable(tokens)
+    for idx in range(len(tokens)):
+        expected = next(
+            (other for other in range(idx, len(tokens))
+             if tokens[other].type in (tokenize.NL, tokenize.NEWLINE)),
+            len(tokens),
+        )
+        assert token_table.next_line_breaks[idx] == expected
@@ -0,0 +1,152 @@
+# Copyright Rouven Bauer
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import tokenize
+
+import pytest
+
+from flake8_picky_parentheses._token_table import TokenTable
+from flake8_picky_parentheses._util import (
+    CALL,
+    classify_parens,
+    DEFINITION,
+    DISPLAY,
+    find_parens_coords,
+    GENERATOR,
+    GROUPING,
+    OPEN_LIST,
+    ParensTable,
+    SUBSCRIPT,
+)
+
+
+@pytest.mark.parametrize(("s", "kinds"), (
+    ("foo(a)", [CALL]),
+    ("foo(a)(b)", [CALL, CALL]),
+    ("'{}'.format(a)", [CALL]),
+    ("x = (a + b)", [GROUPING]),
+    ("x = (a, b)", [GROUPING]),
+    ("x = ()", [GROUPING]),
+    ("return (a)", [GROUPING]),
+    ("foo((a))", [GROUPING, CALL]),
+    ("x = (a for a in b)", [GENERATOR]),
+    ("foo(a for a in b)", [CALL]),
+    ("x = ([a for a in b])", [DISPLAY, GROUPING]),
+    ("x = a[(b)]", [GROUPING, SUBSCRIPT]),
+    ("x = [a, {b: c}]", [DISPLAY, DISPLAY]),
+    ("def foo(a=(1)): pass", [GROUPING, DEFINITION]),
+    ("class Foo(Bar): pass", [DEFINITION]),
+    ("def foo[T](a): pass", [DEFINITION, DEFINITION]),
+    ("x = type(a)", [CALL]),
+    ("x = match(a)", [CALL]),
+    ("match (a):\n    case (b):\n        pass", [GROUPING, GROUPING]),
+))
+def test_classify_parens(s, kinds):
+    lines = iter(s.splitlines(keepends=True))
+    tokens = list(tokenize.generate_tokens(lambda: next(lines)))
+    assert classify_parens(tokens, find_parens_coords(tokens)) == kinds
+
+
+@pytest.mark.parametrize("s", (
+    "x = 1",
+    "foo(a, [b], {c: (d,)})",
+    "x = (\n    a,\n    b\n)",
+    "x = [\n    (a)]\nfoo(  # comment\n    b)",
+))
+def test_parens_table_matches_find_parens_coords(s):
+    lines = iter(s.splitlines(keepends=True))
+    tokens = list(tokenize.generate_tokens(lambda: next(lines)))
+    parens_coords = find_parens_coords(tokens)
+    parens_table = ParensTable(tokens)
+    assert len(parens_table) == len(parens_coords)
+    assert list(parens_table) == parens_coords
+    assert [parens_table[idx] for idx in range(len(parens_table))] \
+        == parens_coords
+    assert parens_table[1:] == parens_coords[1:]
+    assert [parens_table[idx] for idx in parens_table.open_order] \
+        == sorted(parens_coords, key=lambda x: x.token_indexes[0])
+
+
+@pytest.mark.parametrize("s", (
+    "x = 1",
+    "foo(a, [b], {c: (d,)})",
+    "x = (\n    a,\n    [b, (c)]\n)\ny = {a: ((b), [c]), d: ()}",
+    "x = [[[(a)], ()], (((b)))]",
+))
+def test_parens_table_nesting(s):
+    lines = iter(s.splitlines(keepends=True))
+    tokens = list(tokenize.generate_tokens(lambda: next(lines)))
+    parens_table = ParensTable(tokens)
+    spans = [parens_coord.token_indexes for parens_coord in parens_table]
+
+    def encloses(outer, inner):
+        return outer[0] < inner[0] and inner[1] < outer[1]
+
+    for idx, span in enumerate(spans):
+        ancestors = [other for other in spans if encloses(other, span)]
+        assert parens_table.depths[idx] == len(ancestors)
+        parent = parens_table.parents[idx]
+        if ancestors:
+            # the innermost one
+            assert spans[parent] == max(ancestors)
+        else:
+            assert parent == -1
+        assert parens_table.child_counts[idx] == sum(
+            other_parent == idx for other_parent in parens_table.parents
+        )
+        assert OPEN_LIST[parens_table.kinds[idx]] == tokens[span[0]].string
+
+
+_COLUMNS = (
+    "open_rows", "open_cols", "open_end_cols", "spaced", "close_rows",
+    "close_cols", "open_indexes", "close_indexes", "kinds", "depths",
+    "child_counts", "open_order", "parents",
+)
+
+
+@pytest.mark.parametrize("s", (
+    "x = 1",
+    "(a)",
+    "foo(a, [b], {c: (d,)})",
+    "x = (\n    a,\n    [b, (c)]\n)\ny = {a: ((b), [c]), d: ()}",
+    "x = [\n    (a)]\nfoo(  # comment\n    b)",
+    "x = [[[(a)], ()], (((b)))]",
+    "x = f'{a}(' + '[' + f'{ {b: (c)} }'\nfoo(\n(\n    1\n)\n)",
+    "".join(f"x{i} = [({i},\n    {{'a': [{i}]}}), ()]\n" for i in range(50)),
+))
+def test_parens_table_numpy_matches_scan(s):
+    pytest.importorskip("numpy")
+    lines = iter(s.splitlines(keepends=True))
+    tokens = list(tokenize.generate_tokens(lambda: next(lines)))
+    parens_table = ParensTable(tokens)
+    numpy_parens_table = ParensTable.__new__(ParensTable)
+    assert numpy_parens_table._match_with_numpy(tokens, TokenTable(tokens))
+    for name in _COLUMNS:
+        assert getattr(numpy_parens_table, name) \
+            == getattr(parens_table, name), name
+    assert list(numpy_parens_table) == find_parens_coords(tokens)
+
+
+def test_parens_table_numpy_leaves_mismatched_brackets_to_scan():
+    pytest.importorskip("numpy")
+    lines = iter(["foo(a)\n"])
+    tokens = list(tokenize.generate_tokens(lambda: next(lines)))
+    close = next(idx for idx, token in enumerate(tokens)
+                 if token.string == ")")
+    tokens[close] = tokens[close]._replace(string="]")
+    parens_table = ParensTable.__new__(ParensTable)
+    assert not parens_table._match_with_numpy(tokens, None)
+    with pytest.raises(AssertionError):
+        ParensTable(tokens)